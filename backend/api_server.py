@@ -3,6 +3,7 @@ FastAPI server for Green Agent chatbot with CORS support.
 """
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 import asyncio
@@ -23,6 +24,17 @@ from green_agent.streaming.event_queue import get_event_queue
 from green_agent.streaming.event_stream import get_event_stream
 from green_agent.integration import wrap_white_agent_tools
 
+try:
+    import orjson
+
+    def _dumps_event(event: Dict[str, Any]) -> str:
+        """Serialize a streamed event for the websocket (non-JSON values fall back to str)."""
+        return orjson.dumps(event, default=str).decode()
+except ImportError:
+    def _dumps_event(event: Dict[str, Any]) -> str:
+        """Serialize a streamed event for the websocket (non-JSON values fall back to str)."""
+        return json.dumps(event, default=str)
+
 # Configure logging
 # Setup log file capturing
 LOG_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend.log")
@@ -421,6 +433,21 @@ async def chat_white_agent(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/chat/stream")
+async def chat_white_agent_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint for White Agent: newline-delimited JSON events,
+    white_agent_token chunks followed by one final_response
+    """
+    logger.info(f"Received streaming message: {request.message}")
+    
+    async def events():
+        async for event in white_agent.process_message_stream(request.message):
+            yield _dumps_event(event) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
 @app.post("/api/chat/green")
 async def chat_green_agent(request: ChatRequest):
     """
@@ -618,7 +645,7 @@ async def websocket_green_agent(websocket: WebSocket):
             nonlocal final_response_sent
             try:
                 # Drop any tool/trace events after final response was sent
-                if final_response_sent and event.get("type") in {"tool_call", "tool_call_step", "trace_update", "react_step"}:
+                if final_response_sent and event.get("type") in {"tool_call", "tool_call_step", "tool_call_steps_batch", "trace_update", "react_step", "white_agent_token"}:
                     logger.debug(f"[WebSocket] Skipping event after final response: {event.get('type')}")
                     return
 
@@ -634,9 +661,12 @@ async def websocket_green_agent(websocket: WebSocket):
                     # If we can't check state, try to send anyway
                     pass
                 
-                logger.info(f"[WebSocket] Sending event to client: {event.get('type', 'unknown')}")
-                await websocket.send_json(event)
-                logger.info(f"[WebSocket] Event sent successfully: {event.get('type', 'unknown')}")
+                event_type = event.get('type', 'unknown')
+                # Token events are too frequent for INFO and would crowd the trace out of backend.log
+                log_level = logging.DEBUG if event_type == "white_agent_token" else logging.INFO
+                logger.log(log_level, f"[WebSocket] Sending event to client: {event_type}")
+                await websocket.send_text(_dumps_event(event))
+                logger.log(log_level, f"[WebSocket] Event sent successfully: {event_type}")
             except (WebSocketDisconnect, ConnectionError) as e:
                 # Client disconnected - this is normal, don't log as error
                 logger.debug(f"[WebSocket] Client disconnected while sending event: {event.get('type', 'unknown')}")
@@ -760,9 +790,13 @@ async def websocket_green_agent(websocket: WebSocket):
                     # Extract last White Agent message from state
                     messages = eval_result.get("messages", [])
                     logger.info(f"[WebSocket] Found {len(messages)} messages in result")
-                    white_agent_messages = [m for m in messages if hasattr(m, 'agent_type') and m.agent_type.value == 'white_agent']
-                    if white_agent_messages:
-                        white_agent_output = white_agent_messages[-1].content
+                    # Reverse scan: only the last White Agent message is needed
+                    last_white = next(
+                        (m for m in reversed(messages) if hasattr(m, 'agent_type') and m.agent_type.value == 'white_agent'),
+                        None,
+                    )
+                    if last_white is not None:
+                        white_agent_output = last_white.content
                         logger.info(f"[WebSocket] Extracted from messages (length: {len(white_agent_output) if white_agent_output else 0})")
                     else:
                         logger.warning(f"[WebSocket] No white_agent messages found in {len(messages)} messages")
@@ -858,7 +892,7 @@ async def websocket_green_agent(websocket: WebSocket):
                     if hasattr(handler, 'flush'):
                         handler.flush()
                 
-                from green_agent.analysis.trace_analyzer import analyze_backend_logs
+                from green_agent.analysis.trace_analyzer import analyze_backend_logs_async
                 logger.info("[WebSocket] ===== STARTING BACKEND LOG ANALYSIS (FINAL STEP) =====")
                 logger.info("[WebSocket] All tool execution complete. Analyzing logs to extract detailed action breakdown...")
                 
@@ -873,7 +907,7 @@ async def websocket_green_agent(websocket: WebSocket):
                 # Analyze the backend logs to extract detailed action breakdown
                 # This looks at AgentExecutor's Thought/Action/Observation cycles
                 # Pass tool names from ledger to help with detection
-                trace_analysis = analyze_backend_logs(
+                trace_analysis = await analyze_backend_logs_async(
                     log_lines=2000,  # Get more lines for complete context
                     known_tools=tool_names_from_ledger if tool_names_from_ledger else None
                 )
@@ -903,7 +937,7 @@ async def websocket_green_agent(websocket: WebSocket):
                                     "trace_analysis": trace_analysis
                                 }
                             }
-                            await websocket.send_json(analysis_update)
+                            await websocket.send_text(_dumps_event(analysis_update))
                             logger.info("[WebSocket] Trace analysis update sent to client")
                         else:
                             logger.warning(f"[WebSocket] Cannot send trace analysis, WebSocket not connected: {current_state}")
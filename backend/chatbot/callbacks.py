@@ -0,0 +1,51 @@
+"""
+Logging callbacks for the White Agent's AgentExecutor.
+"""
+import logging
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# Observations can be whole JSON result sets; the trace analyzer only needs a preview
+MAX_OBSERVATION_LOG_CHARS = 2000
+
+
+class AgentTraceLogHandler(BaseCallbackHandler):
+    """Log the ReAct trace (what AgentExecutor(verbose=True) printed) through logging.
+
+    The trace analyzer reads backend.log for the same markers the verbose stdout
+    output used ("Entering new AgentExecutor chain", Thought/Action/Observation,
+    "Final Answer:", "Finished chain"), so they are logged at INFO.
+    Pass it in the invoke config so tool callbacks reach it too.
+    """
+
+    def on_chain_start(
+        self, serialized: Dict[str, Any], inputs: Dict[str, Any], *,
+        run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any
+    ) -> None:
+        if parent_run_id is None:
+            logger.info("> Entering new AgentExecutor chain...")
+
+    def on_chain_end(
+        self, outputs: Dict[str, Any], *,
+        run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any
+    ) -> None:
+        if parent_run_id is None:
+            logger.info("> Finished chain.")
+
+    def on_agent_action(self, action: AgentAction, **kwargs: Any) -> Any:
+        # action.log holds the raw "Thought: ... Action: ... Action Input: ..." text
+        logger.info(action.log)
+
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        text = str(output)
+        if len(text) > MAX_OBSERVATION_LOG_CHARS:
+            text = text[:MAX_OBSERVATION_LOG_CHARS] + "..."
+        logger.info(f"Observation: {text}")
+
+    def on_agent_finish(self, finish: AgentFinish, **kwargs: Any) -> None:
+        logger.info(finish.log)
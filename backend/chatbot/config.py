@@ -27,6 +27,10 @@ class Settings(BaseSettings):
     
     max_conversation_length: int = 50
     response_timeout: int = 30
+    # Build the full markdown evaluation report for the chat message (structured result is always returned)
+    include_eval_markdown: bool = False
+    # Concurrent Anthropic API calls allowed per event loop (Supervisor + evaluation)
+    max_llm_concurrency: int = 4
     
     
     log_level: str = "INFO"
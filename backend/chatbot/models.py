@@ -2,7 +2,7 @@
 Pydantic models for the Green Agent chatbot.
 """
 from typing import List, Optional, Dict, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from datetime import datetime
 from enum import Enum
 
@@ -20,14 +20,17 @@ class MessageType(str, Enum):
     SYSTEM = "system"
 
 class ChatMessage(BaseModel):
+    # Immutable once created: history entries are shared between agent states
+    model_config = ConfigDict(
+        frozen=True,
+        json_encoders={
+            datetime: lambda v: v.isoformat()
+        },
+    )
+    
     content: str
     agent_type: AgentType = AgentType.USER
     timestamp: Optional[datetime] = None
-    
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
 
 class ToolCall(BaseModel):
     name: str
@@ -2,28 +2,173 @@
 Tools for the Green Agent chatbot, including flight booking functionality.
 """
 import asyncio
+import contextvars
+import functools
 import logging
-from typing import Dict, Any, List
-import sys
-import os
-import pandas as pd
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextvars import ContextVar
+from typing import Dict, Any, Callable, List, Tuple
 from pydantic import Field
-# import logger from lo
-import logging
-
-# Add parent directory to path for imports
-parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-if parent_dir not in sys.path:
-    sys.path.insert(0, parent_dir)
 
 from tools.flights import flight_tool
+# Optional param-extraction helper, used only for debug logging; resolved once here
+# instead of re-attempting the import on every FlightSearchTool call
+try:
+    from tools.flights import get_flight_params as _get_flight_params
+except ImportError:
+    _get_flight_params = None
 from tools.restaurant import restaurant_tool
 from langchain.tools import BaseTool
 from tools.hotels import hotel_tool
+from tools.deadline import CALL_DEADLINE
 
 logger = logging.getLogger(__name__)
 
-class FlightSearchTool(BaseTool):
+# Successful search results keyed by (tool_name, normalized query). Shared by all
+# tool instances and intentionally NOT cleared by clear_context(), so retries and
+# repeated itinerary legs reuse the previous fixture/API result.
+RESULT_CACHE_TTL_SECONDS = 900
+RESULT_CACHE_MAXSIZE = 256
+_result_cache: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+# Punctuation runs are treated as separators in cache keys, so the agent's small
+# rephrasings ("NYC -> LAX, Dec 5." vs "nyc lax dec 5") share one entry. Word order
+# is kept: "NYC to LAX" and "LAX to NYC" are different searches.
+_QUERY_PUNCT_RE = re.compile(r"[^\w\s]+")
+
+# Leading text of the failure messages flight_tool / hotel_tool / restaurant_tool
+# return instead of raising (lowercase). Such results must not be cached: a transient
+# network or API error would otherwise be replayed for the whole TTL.
+_UNCACHEABLE_RESULT_PREFIXES = (
+    "error",
+    "permanent_failure",
+    "network error",
+    "invalid response from",
+    "unexpected error",
+    "no hotel data returned",
+    "no hotels found",
+    "hotel search temporarily unavailable",
+    "sorry, no matching results",
+)
+
+
+# Byte-identical retries (the usual AgentExecutor pattern) skip the regex pass via
+# the lru_cache; the normalized key then hits _result_cache as before.
+@functools.lru_cache(maxsize=RESULT_CACHE_MAXSIZE)
+def _normalize_query(query: str) -> str:
+    """Canonical cache key for a search query: lowercase, punctuation-free, single-spaced."""
+    return " ".join(_QUERY_PUNCT_RE.sub(" ", query.lower()).split())
+
+
+def _cached_search(tool_name: str, search_fn: Callable[[str], Any], query: str) -> Any:
+    """Run search_fn(query), reusing a recent successful result for an equivalent query."""
+    key = (tool_name, _normalize_query(query))
+    now = time.monotonic()
+    with _result_cache_lock:
+        hit = _result_cache.get(key)
+        if hit is not None:
+            if now - hit[0] < RESULT_CACHE_TTL_SECONDS:
+                _result_cache.move_to_end(key)
+                logger.info(f"[{tool_name}] Result cache hit for query: {key[1][:100]}")
+                return hit[1]
+            del _result_cache[key]
+
+    result = search_fn(query)
+
+    # Only cache real results; errors and empty responses should be retried
+    if result and not str(result).lstrip().lower().startswith(_UNCACHEABLE_RESULT_PREFIXES):
+        with _result_cache_lock:
+            _result_cache[key] = (now, result)
+            _result_cache.move_to_end(key)
+            while len(_result_cache) > RESULT_CACHE_MAXSIZE:
+                _result_cache.popitem(last=False)
+    return result
+
+
+def clear_result_cache():
+    """Drop all cached search results."""
+    with _result_cache_lock:
+        _result_cache.clear()
+
+
+# Dedicated, bounded pool for blocking tool I/O. The loop's default executor is shared
+# with everything else and grows to min(32, cpu+4) threads under agent fan-out.
+TOOL_EXECUTOR_MAX_WORKERS = 8
+_tool_worker = threading.local()
+
+
+def _mark_tool_worker() -> None:
+    _tool_worker.active = True
+
+
+_TOOL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=TOOL_EXECUTOR_MAX_WORKERS, thread_name_prefix="tool", initializer=_mark_tool_worker
+)
+
+
+async def _run_in_tool_executor(fn: Callable[[str], Any], query: str) -> Any:
+    """Run a blocking tool call on the tool pool, carrying the current contextvars like to_thread."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_TOOL_EXECUTOR, ctx.run, fn, query)
+
+
+# Conversation context for the current White Agent turn. WhiteAgent sets it once
+# per turn instead of copying the context into every tool instance; tools that
+# need it read it lazily via get_tool_context().
+TOOL_CONVERSATION_CONTEXT: ContextVar[Tuple[Dict[str, str], ...]] = ContextVar(
+    "tool_conversation_context", default=()
+)
+
+
+def set_tool_context(context) -> None:
+    """Set the conversation context visible to tools for the current turn."""
+    TOOL_CONVERSATION_CONTEXT.set(tuple(context or ()))
+
+
+def get_tool_context() -> Tuple[Dict[str, str], ...]:
+    """Get the conversation context for the current turn."""
+    return TOOL_CONVERSATION_CONTEXT.get()
+
+
+def clear_tool_context() -> None:
+    """Clear the conversation context at the end of a turn."""
+    TOOL_CONVERSATION_CONTEXT.set(())
+
+
+class _ResultPreview:
+    """Lazy log argument: str(result) (which may render a whole DataFrame) only runs if the record is emitted."""
+
+    __slots__ = ("result",)
+
+    def __init__(self, result: Any):
+        self.result = result
+
+    def __str__(self) -> str:
+        return (str(self.result)[:500] + "...") if self.result else "None"
+
+
+class SharedContextMixin:
+    """Tool context accessors backed by TOOL_CONVERSATION_CONTEXT, so clearing is one assignment."""
+
+    @property
+    def context(self) -> Tuple[Dict[str, str], ...]:
+        return get_tool_context()
+
+    def set_context(self, context):
+        set_tool_context(context)
+
+    def clear_context(self):
+        """Clear conversation context for new turn"""
+        clear_tool_context()
+
+
+class FlightSearchTool(SharedContextMixin, BaseTool):
     name: str = Field(
         default="flight_search", 
         description="Searches for flights between locations with dates, prices, airlines, and options."
@@ -39,47 +184,37 @@ class FlightSearchTool(BaseTool):
         ),
         description="Searches and analyzes flights based on user context and query."
     )
-    context: List[Dict[str, str]] = Field(default_factory=list, description="The context of the conversation.")
-
-    def set_context(self, context):
-        self.context = context or []
-
-    def clear_context(self):
-        """Clear conversation context for new turn"""
-        self.context = []
-
     def _run(self, query: str) -> str:
         try:
-            print("✈️ Running FlightSearchTool:", query, flush=True)
+            logger.info("✈️ Running FlightSearchTool: %s", query)
 
             # Use ONLY the query - don't merge with context messages
             # The AgentExecutor already provides proper context through conversation history
             # Merging causes confusion (e.g., seeing both departure and return dates when agent only passes one)
             full_prompt = query.strip()
             
-            print("Full prompt:", full_prompt, flush=True)
+            logger.debug("Full prompt: %s", full_prompt)
 
             # Try to extract params, but don't die if helper isn't present
-            try:
-                from tools.flights import get_flight_params
-                params = get_flight_params(full_prompt)
-                print("Parsed params:", params, flush=True)
-            except Exception as e:
-                print(f"[param-extract skipped] {e}", flush=True)
+            if _get_flight_params is not None and logger.isEnabledFor(logging.DEBUG):
+                try:
+                    logger.debug("Parsed params: %s", _get_flight_params(full_prompt))
+                except Exception as e:
+                    logger.debug("[param-extract skipped] %s", e)
 
             # 🔹 Call your real flight search
-            result = flight_tool(full_prompt)
-            print("Tool result preview:", (str(result)[:500] + "...") if result else "None", flush=True)
+            result = _cached_search(self.name, flight_tool, full_prompt)
+            logger.debug("Tool result preview: %s", _ResultPreview(result))
             return result or "No flights found."
         except Exception as e:
-            print(f"[FlightSearchTool error] {e}", flush=True)
+            logger.error("[FlightSearchTool error] %s", e)
             return f"Error in FlightSearchTool: {e}"
 
     async def _arun(self, query: str):
-        return await asyncio.to_thread(self._run, query)
+        return await _run_in_tool_executor(self._run, query)
 
 
-class RestaurantSearchTool(BaseTool):
+class RestaurantSearchTool(SharedContextMixin, BaseTool):
     name: str = Field(
         default="restaurant_search", 
         description="Searches for restaurants, cafes, bars, and dining options at a specific location."
@@ -97,38 +232,29 @@ class RestaurantSearchTool(BaseTool):
         ),
         description="Searches and analyzes restaurants based on user context and query."
     )
-    context: List[Dict[str, str]] = Field(default_factory=list, description="The context of the conversation.")
-
-    def set_context(self, context):
-        self.context = context or []
-
-    def clear_context(self):
-        """Clear conversation context for new turn"""
-        self.context = []
-
     def _run(self, query: str) -> str:
         try:
-            print("🍴 Running RestaurantSearchTool:", query, flush=True)
+            logger.info("🍴 Running RestaurantSearchTool: %s", query)
 
             # Use ONLY the query - don't merge with context messages
             # The AgentExecutor already provides proper context through conversation history
             # Merging causes confusion and double-processing
             full_prompt = query.strip()
             
-            print("Full prompt:", full_prompt, flush=True)
+            logger.debug("Full prompt: %s", full_prompt)
 
             # 🔹 Call your real restaurant search
-            result = restaurant_tool(full_prompt)
-            print("Tool result preview:", (str(result)[:500] + "...") if result else "None", flush=True)
+            result = _cached_search(self.name, restaurant_tool, full_prompt)
+            logger.debug("Tool result preview: %s", _ResultPreview(result))
             return result or "No restaurants found."
         except Exception as e:
-            print(f"[RestaurantSearchTool error] {e}", flush=True)
+            logger.error("[RestaurantSearchTool error] %s", e)
             return f"Error in RestaurantSearchTool: {e}"
 
     async def _arun(self, query: str):
-        return await asyncio.to_thread(self._run, query)
+        return await _run_in_tool_executor(self._run, query)
 
-class HotelSearchTool(BaseTool):
+class HotelSearchTool(SharedContextMixin, BaseTool):
     name: str = Field(
         default="hotel_search", 
         description="Searches for hotels based on location and dates."
@@ -146,26 +272,109 @@ class HotelSearchTool(BaseTool):
         ),
         description="Searches and analyzes hotels based on user context and query."
     )
-    context: List[Dict[str, str]] = Field(default_factory=list, description="The context of the conversation.")
-
-    def set_context(self, context):
-        self.context = context or []
-
-    def clear_context(self):
-        """Clear conversation context for new turn"""
-        self.context = []
-
     def _run(self, query: str) -> str:
         try:
-            print("🏨 Running HotelSearchTool:", query, flush=True)
+            logger.info("🏨 Running HotelSearchTool: %s", query)
             full_prompt = query.strip()
-            print("Full prompt:", full_prompt, flush=True)
-            result = hotel_tool(full_prompt)
-            print("Tool result preview:", (str(result)[:500] + "...") if result else "None", flush=True)
+            logger.debug("Full prompt: %s", full_prompt)
+            result = _cached_search(self.name, hotel_tool, full_prompt)
+            logger.debug("Tool result preview: %s", _ResultPreview(result))
             return result or "No hotels found."
         except Exception as e:
-            print(f"[HotelSearchTool error] {e}", flush=True)
+            logger.error("[HotelSearchTool error] %s", e)
             return f"Error in HotelSearchTool: {e}"
 
     async def _arun(self, query: str):
-        return await asyncio.to_thread(self._run, query)
+        return await _run_in_tool_executor(self._run, query)
+
+
+# Per-leg budget for ItineraryTool; a slow leg is reported instead of holding up the others
+ITINERARY_LEG_TIMEOUT_SECONDS = 120
+
+
+def _run_leg(leg: BaseTool, query: str, deadline: float) -> Any:
+    """Run one itinerary leg with its deadline visible to the leg's HTTP and LLM requests."""
+    CALL_DEADLINE.set(deadline)
+    return leg._run(query)
+
+
+class ItineraryTool(SharedContextMixin, BaseTool):
+    name: str = Field(
+        default="itinerary_search",
+        description="Searches flights, hotels, and restaurants for a trip in one step."
+    )
+    description: str = Field(
+        default=(
+            "Plans a trip by running flight_search, hotel_search, and restaurant_search at the same time "
+            "for one trip description. Use this tool when the user wants a full itinerary or asks to "
+            "plan a trip that needs flights, a place to stay, and places to eat. "
+            "Pass a single query with the origin, destination, and travel dates. "
+            "It returns each search's results under its own heading; use the individual tools "
+            "instead when the user only needs one of them."
+        ),
+        description="Runs the flight, hotel, and restaurant searches concurrently for a trip."
+    )
+    # The search tool instances to fan out to (shared with the agent, so fixture patches apply)
+    legs: List[BaseTool] = Field(default_factory=list, exclude=True)
+
+    def _format(self, results) -> str:
+        parts = []
+        for leg, result in zip(self.legs, results):
+            if isinstance(result, (asyncio.TimeoutError, FutureTimeoutError)):
+                result = f"Error in {leg.name}: timed out after {ITINERARY_LEG_TIMEOUT_SECONDS}s"
+            elif isinstance(result, Exception):
+                result = f"Error in {leg.name}: {result}"
+            parts.append(f"## {leg.name}\n{result}")
+        return "\n\n".join(parts)
+
+    def _run(self, query: str) -> str:
+        # Plain threads rather than asyncio.run: this can be called from inside a running
+        # loop (the fixture integration's _arun calls _run directly).
+        logger.info("🧳 Running ItineraryTool: %s", query)
+        deadline = time.monotonic() + ITINERARY_LEG_TIMEOUT_SECONDS
+        if getattr(_tool_worker, "active", False):
+            # Already on a tool worker: waiting on the same pool could starve it, so run inline
+            results = []
+            for leg in self.legs:
+                try:
+                    results.append(contextvars.copy_context().run(_run_leg, leg, query, deadline))
+                except Exception as e:
+                    results.append(e)
+            return self._format(results)
+        
+        futures = [
+            _TOOL_EXECUTOR.submit(contextvars.copy_context().run, _run_leg, leg, query, deadline)
+            for leg in self.legs
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result(timeout=max(deadline - time.monotonic(), 0)))
+            except Exception as e:
+                # A leg still queued is dropped; a running one stops at its deadline
+                future.cancel()
+                results.append(e)
+        return self._format(results)
+
+    async def _arun(self, query: str):
+        logger.info("🧳 Running ItineraryTool: %s", query)
+        # Legs run their sync _run on the tool pool (with the tool context), so
+        # wall-clock is the slowest search rather than the sum of all three
+        deadline = time.monotonic() + ITINERARY_LEG_TIMEOUT_SECONDS
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(
+                    _run_in_tool_executor(functools.partial(_run_leg, leg, deadline=deadline), query),
+                    ITINERARY_LEG_TIMEOUT_SECONDS,
+                )
+                for leg in self.legs
+            ),
+            return_exceptions=True,
+        )
+        return self._format(results)
+
+
+def build_search_tools() -> List[BaseTool]:
+    """Create the White Agent's tool set: the three searches plus the itinerary fan-out over them."""
+    legs = [FlightSearchTool(), RestaurantSearchTool(), HotelSearchTool()]
+    return [*legs, ItineraryTool(legs=legs)]
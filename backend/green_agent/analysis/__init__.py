@@ -1,5 +1,4 @@
 """Analysis utilities for Green Agent."""
-from .trace_analyzer import analyze_backend_logs, analyze_trace_ledger, get_trace_summary_text
-
-__all__ = ['analyze_backend_logs', 'analyze_trace_ledger', 'get_trace_summary_text']
+from .trace_analyzer import analyze_backend_logs, analyze_backend_logs_async, analyze_backend_logs_batch, analyze_trace_ledger, get_trace_summary_text, TraceAnalysis
 
+__all__ = ['analyze_backend_logs', 'analyze_backend_logs_async', 'analyze_backend_logs_batch', 'analyze_trace_ledger', 'get_trace_summary_text', 'TraceAnalysis']
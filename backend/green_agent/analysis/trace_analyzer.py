@@ -1,13 +1,28 @@
 """LLM-based backend logs analyzer."""
-import json
+import asyncio
+import functools
+import io
+import itertools
 import logging
-from typing import Dict, Any, Optional, List
+import mmap
+import threading
+from typing import Dict, Any, Iterable, Iterator, Optional, List, Tuple, TypedDict, Union
 import anthropic
 import os
+import re
+import time
+import weakref
+from collections import deque
 from dotenv import load_dotenv
-import subprocess
 from pathlib import Path
-import sys
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+from ..utils.json_extract import extract_json_object
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 load_dotenv()
 
@@ -163,9 +178,229 @@ TRACE_ANALYSIS_SCHEMA = {
 }
 
 
+
+class ToolCallAnalysis(TypedDict, total=False):
+    """A tool call in TRACE_ANALYSIS_SCHEMA output."""
+    tool_name: str
+    purpose: str
+    key_parameters: Dict[str, Any]
+    result_summary: str
+
+
+class DataFrameOperationAnalysis(TypedDict, total=False):
+    """A DataFrame operation in TRACE_ANALYSIS_SCHEMA output."""
+    operation_type: str
+    dataframe_name: str
+    operation: str
+    full_expression: str
+    purpose: str
+
+
+class AnalysisStep(TypedDict, total=False):
+    """An analysis step in TRACE_ANALYSIS_SCHEMA output."""
+    step_number: int
+    description: str
+    tools_used: List[str]
+    dataframe_ops: List[str]
+
+
+class DetailedAction(TypedDict, total=False):
+    """A Thought/Action/Observation cycle in TRACE_ANALYSIS_SCHEMA output."""
+    action_number: int
+    thought: str
+    action: str
+    action_input: str
+    observation: str
+    dataframe_functions: List[str]
+    dataframe_columns: List[str]
+    dataframe_name: str
+
+
+class TraceAnalysis(TypedDict, total=False):
+    """Output of the analyze_trace_ledger tool (TRACE_ANALYSIS_SCHEMA)."""
+    summary: str
+    tool_calls: List[ToolCallAnalysis]
+    dataframe_operations: List[DataFrameOperationAnalysis]
+    analysis_steps: List[AnalysisStep]
+    key_insights: List[str]
+    detailed_actions: List[DetailedAction]
+
+
+# List fields of TraceAnalysis; consumers iterate them without checking
+_TRACE_ANALYSIS_LIST_FIELDS = ("tool_calls", "dataframe_operations", "analysis_steps", "key_insights", "detailed_actions")
+
+
+def _as_trace_analysis(data: Any) -> Optional[TraceAnalysis]:
+    """
+    Check model output against the TraceAnalysis shape.
+    
+    Returns None if it isn't an object; otherwise fills in a missing summary
+    and replaces missing or non-list list fields with empty lists.
+    """
+    if not isinstance(data, dict):
+        return None
+    if not isinstance(data.get("summary"), str):
+        data["summary"] = ""
+    for field in _TRACE_ANALYSIS_LIST_FIELDS:
+        if not isinstance(data.get(field), list):
+            data[field] = []
+    return data
+
+# Candidate backend.log locations, resolved once at import
+POSSIBLE_LOG_FILES = (
+    Path(__file__).parent.parent.parent / "backend" / "backend.log",
+    Path.cwd() / "backend.log",
+    Path.cwd() / "backend" / "backend.log",
+)
+_log_file: Optional[Path] = next((p for p in POSSIBLE_LOG_FILES if p.exists()), None)
+
+
+def _resolve_log_file() -> Optional[Path]:
+    """Return the backend log file, re-checking candidates only until one exists."""
+    global _log_file
+    if _log_file is None:
+        _log_file = next((p for p in POSSIBLE_LOG_FILES if p.exists()), None)
+    return _log_file
+
+
+def _tail_bytes(path: Path, n_lines: int, block: int = 65536) -> Tuple[bytes, int]:
+    """
+    Read the last n_lines of a file by seeking backwards in fixed-size blocks.
+    
+    Only the tail is read, so cost scales with n_lines rather than with the
+    size of the log file.
+    
+    Returns:
+        (raw tail, file offset the tail ends at)
+    """
+    chunks = deque()
+    newlines = 0
+    with open(path, 'rb') as f:
+        end = pos = f.seek(0, os.SEEK_END)
+        # One extra newline: the file usually ends with one
+        while pos > 0 and newlines <= n_lines:
+            size = min(block, pos)
+            pos -= size
+            f.seek(pos)
+            chunk = f.read(size)
+            newlines += chunk.count(b'\n')
+            chunks.appendleft(chunk)
+    tail = b''.join(chunks).splitlines(keepends=True)[-n_lines:]
+    return b''.join(tail), end
+
+
+# Logs at least this large are tailed through mmap instead of block reads
+MMAP_MIN_BYTES = 1 << 20
+
+
+def _tail_mmap(path: Path, n_lines: int) -> Tuple[bytes, int]:
+    """
+    Read the last n_lines of a file by walking newlines backwards in a memory map.
+    
+    The file is served from the page cache; only the tail slice is copied.
+    
+    Returns:
+        (raw tail, file offset the tail ends at)
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # The final newline ends the last line rather than starting a new one
+        pos = len(mm) - 1 if mm[-1:] == b'\n' else len(mm)
+        for _ in range(n_lines):
+            pos = mm.rfind(b'\n', 0, pos)
+            if pos == -1:
+                break
+        return mm[pos + 1:], len(mm)
+
+
+def _read_tail(path: Path, n_lines: int) -> Tuple[bytes, int]:
+    """Tail a file with mmap when it's large, block reads otherwise."""
+    if path.stat().st_size >= MMAP_MIN_BYTES:
+        return _tail_mmap(path, n_lines)
+    return _tail_bytes(path, n_lines)
+
+
+# Tool markers not found in the requested window are searched for in this many recent lines
+MARKER_SEARCH_LOG_LINES = 30000
+
+
+class _LogCheckpoint:
+    """
+    Recent complete lines of the log file and the offset they were read up to.
+    
+    Later reads only fetch the bytes appended since; the checkpoint is
+    dropped when the file is rotated (new inode) or truncated.
+    """
+    __slots__ = ("path", "inode", "offset", "lines")
+    
+    def __init__(self, path: Path, inode: int, offset: int):
+        self.path = path
+        self.inode = inode
+        self.offset = offset
+        self.lines = deque(maxlen=LOG_CHECKPOINT_MAX_LINES)
+    
+    def read_appended(self) -> Optional[bytes]:
+        """
+        Read the bytes appended since self.offset.
+        
+        Returns None if the last absorbed line is no longer in place, i.e. the
+        file was replaced or rewritten without the inode or size giving it away.
+        """
+        last_line = self.lines[-1] if self.lines else b''
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset - len(last_line))
+            data = f.read()
+        if not data.startswith(last_line):
+            return None
+        return data[len(last_line):]
+    
+    def absorb(self, data: bytes) -> bytes:
+        """Add bytes read from self.offset; returns the trailing partial line (not yet absorbed)."""
+        complete, newline, partial = data.rpartition(b'\n')
+        if newline:
+            self.lines.extend(line + b'\n' for line in complete.split(b'\n'))
+        self.offset += len(data) - len(partial)
+        return partial
+
+
+# Lines kept by the checkpoint; larger requests bypass it
+LOG_CHECKPOINT_MAX_LINES = MARKER_SEARCH_LOG_LINES
+_log_checkpoint: Optional[_LogCheckpoint] = None
+_log_checkpoint_lock = threading.Lock()
+
+
+def _read_recent_lines(path: Path, n_lines: int) -> str:
+    """
+    Return the last n_lines of the log file, reading only what was appended
+    since the previous call when the file is unchanged otherwise.
+    """
+    global _log_checkpoint
+    if n_lines > LOG_CHECKPOINT_MAX_LINES:
+        return _read_tail(path, n_lines)[0].decode('utf-8', 'ignore')
+    
+    with _log_checkpoint_lock:
+        st = path.stat()
+        checkpoint = _log_checkpoint
+        data = None
+        if (checkpoint is not None and checkpoint.path == path and checkpoint.inode == st.st_ino
+                and st.st_size >= checkpoint.offset):
+            data = checkpoint.read_appended()
+        if data is None:
+            # First read, or the log was rotated/truncated: seed from the tail
+            data, end = _read_tail(path, LOG_CHECKPOINT_MAX_LINES)
+            checkpoint = _log_checkpoint = _LogCheckpoint(path, st.st_ino, end - len(data))
+        partial = checkpoint.absorb(data)
+        
+        # A partial last line counts as one of the n_lines, as with tail
+        wanted = n_lines - 1 if partial else n_lines
+        lines = list(itertools.islice(reversed(checkpoint.lines), wanted))
+        lines.reverse()
+        lines.append(partial)
+        return b''.join(lines).decode('utf-8', 'ignore')
+
+
 def get_recent_backend_logs(lines: int = 500) -> str:
     """
-    Get recent backend logs by reading from log file or using tail/grep.
+    Get recent backend logs by reading the tail of the log file.
     
     Args:
         lines: Number of recent lines to retrieve
@@ -174,147 +409,172 @@ def get_recent_backend_logs(lines: int = 500) -> str:
         Recent log output as string
     """
     try:
-        # Try multiple log file locations
-        possible_log_files = [
-            Path(__file__).parent.parent.parent / "backend" / "backend.log",
-            Path.cwd() / "backend.log",
-            Path.cwd() / "backend" / "backend.log",
-        ]
+        log_file = _resolve_log_file()
+        if log_file is None:
+            logger.warning(f"Backend log file not found in any of: {list(POSSIBLE_LOG_FILES)}")
+            return ""
         
-        log_file = None
-        for log_path in possible_log_files:
-            if log_path.exists():
-                log_file = log_path
-                break
-        
-        if log_file:
-            # Read last N lines from log file
-            try:
-                result = subprocess.run(
-                    ["tail", "-n", str(lines), str(log_file)],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                if result.returncode == 0 and result.stdout:
-                    logger.info(f"Successfully read {len(result.stdout)} chars from {log_file}")
-                    return result.stdout
-            except FileNotFoundError:
-                # tail command not available, read file directly
-                try:
-                    with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-                        all_lines = f.readlines()
-                        recent_lines = all_lines[-lines:] if len(all_lines) > lines else all_lines
-                        content = ''.join(recent_lines)
-                        logger.info(f"Successfully read {len(content)} chars from {log_file} (direct read)")
-                        return content
-                except Exception as e:
-                    logger.warning(f"Failed to read log file directly: {e}")
-        
-        # Fallback: try to grep process logs if running
-        try:
-            # Try to get logs from running uvicorn process
-            result = subprocess.run(
-                ["ps", "aux"],
-                capture_output=True,
-                text=True,
-                timeout=2
-            )
-            if "uvicorn" in result.stdout or "api_server" in result.stdout:
-                logger.info("Uvicorn process found, but cannot access stdout directly")
-        except:
-            pass
-        
-        logger.warning(f"Backend log file not found in any of: {possible_log_files}")
-        return ""
+        content = _read_recent_lines(log_file, lines)
+        logger.info(f"Successfully read {len(content)} chars from {log_file}")
+        return content
         
     except Exception as e:
         logger.error(f"Error reading backend logs: {e}", exc_info=True)
         return ""
 
 
-def extract_agent_executor_logs(log_content: str) -> str:
+def _last_lines(text: str, n_lines: int) -> str:
+    """Return the last n_lines lines of text, as get_recent_backend_logs(lines=n_lines) would."""
+    # The final newline ends the last line rather than starting a new one
+    pos = len(text) - 1 if text.endswith('\n') else len(text)
+    for _ in range(n_lines):
+        pos = text.rfind('\n', 0, pos)
+        if pos == -1:
+            return text
+    return text[pos + 1:]
+
+
+# Patterns to identify AgentExecutor messages
+AGENT_LOG_PATTERNS = [
+    'Thought:',
+    'Action:',
+    'Action Input:',
+    'Observation:',
+    'Entering new AgentExecutor chain',
+    'Finished chain',
+    'I now know the final answer',
+    'Final Answer:',
+    'python_repl_ast',
+    'df.shape',
+    'df.columns',
+    'df.sort_values',
+    'df.filter',
+    'df.groupby',
+    'df.merge',
+    'df.copy',
+    'df.head',
+    'df.tail',
+    'df.describe',
+    'df.info',
+    'df.value_counts',
+    'df.iterrows',
+    'df.loc',
+    'df.iloc',
+    'Running FlightSearchTool',
+    'Running HotelSearchTool',
+    'Running RestaurantSearchTool',
+    'Running ItineraryTool',
+    '🏨',  # Hotel emoji
+    '🍴',  # Restaurant emoji
+    '✈️',  # Flight emoji
+    'hotel_search',
+    'restaurant_search',
+    'flight_search',
+    'itinerary_search',
+    'AgentExecutor returned output',
+    'Intermediate steps',
+    'ReActCallback',
+    'chat_node',  # Hotel/restaurant tools use chat_node
+    'Making hotel search request',
+    'Making restaurant search request',
+]
+
+# Compiled once: one scan per line instead of one substring test per pattern.
+# Matched against the lowercased line; case-insensitive duplicates are dropped.
+_AGENT_LOG_PATTERNS_LOWER = frozenset(p.lower() for p in AGENT_LOG_PATTERNS)
+_AGENT_LOG_RE = re.compile('|'.join(re.escape(p) for p in sorted(_AGENT_LOG_PATTERNS_LOWER)))
+# ReAct continuation lines (Thought/Action/Observation logged as multi-line
+# messages) start with one of these; a prefix check settles them without a scan
+_AGENT_LOG_PREFIXES = tuple(p for p in ('thought:', 'action:', 'action input:', 'observation:', 'final answer:')
+                            if p in _AGENT_LOG_PATTERNS_LOWER)
+# Context keywords for the lines around a match (matched without lowercasing the line)
+_PREV_CONTEXT_RE = re.compile(r'agent|tool|df\.|action|thought', re.IGNORECASE)
+_NEXT_CONTEXT_RE = re.compile(r'agent|tool|df\.|observation', re.IGNORECASE)
+# DataFrame-related lines: df./pd. are case-sensitive, "dataframe" is not
+_DF_RE = re.compile(r'df\.|pd\.|(?i:dataframe)')
+
+
+# Bounds on what extract_agent_executor_logs buffers: the returned lines, and
+# the lines collected for the chain in progress (older ones fall off)
+MAX_AGENT_LOG_LINES = 500
+MAX_CHAIN_LOG_LINES = 1000
+
+
+def _split_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Strip line endings like str.split('\n') does, including the empty line after a final newline."""
+    ends_with_newline = True
+    for chunk in chunks:
+        ends_with_newline = chunk.endswith('\n')
+        yield chunk[:-1] if ends_with_newline else chunk
+    if ends_with_newline:
+        yield ''
+
+
+def _with_neighbors(lines: Iterable[str]) -> Iterator[Tuple[Optional[str], str, Optional[str]]]:
+    """Yield (previous, current, next) for each line, holding one line of lookahead."""
+    prev_line = None
+    current = None
+    for line in _split_lines(lines):
+        if current is not None:
+            yield prev_line, current, line
+            prev_line = current
+        current = line
+    if current is not None:
+        yield prev_line, current, None
+
+
+def extract_agent_executor_logs(log_content: Union[str, Iterable[str]]) -> str:
     """
     Extract AgentExecutor-related log entries from backend logs.
     Looks for Thought/Action/Observation patterns and DataFrame operations.
+    
+    Args:
+        log_content: Log text, or any iterable of lines (e.g. an open log file);
+                     lines are streamed in one pass rather than split up front
     """
-    lines = log_content.split('\n')
-    agent_lines = []
-    
-    # Patterns to identify AgentExecutor messages
-    patterns = [
-        'Thought:',
-        'Action:',
-        'Action Input:',
-        'Observation:',
-        'Entering new AgentExecutor chain',
-        'Finished chain',
-        'I now know the final answer',
-        'Final Answer:',
-        'python_repl_ast',
-        'df.shape',
-        'df.columns',
-        'df.sort_values',
-        'df.filter',
-        'df.groupby',
-        'df.merge',
-        'df.copy',
-        'df.head',
-        'df.tail',
-        'df.describe',
-        'df.info',
-        'df.value_counts',
-        'df.iterrows',
-        'df.loc',
-        'df.iloc',
-        'Running FlightSearchTool',
-        'Running HotelSearchTool',
-        'Running RestaurantSearchTool',
-        '🏨',  # Hotel emoji
-        '🍴',  # Restaurant emoji
-        '✈️',  # Flight emoji
-        'hotel_search',
-        'restaurant_search',
-        'flight_search',
-        'AgentExecutor returned output',
-        'Intermediate steps',
-        'ReActCallback',
-        'chat_node',  # Hotel/restaurant tools use chat_node
-        'Making hotel search request',
-        'Making restaurant search request',
-    ]
+    if isinstance(log_content, str):
+        log_content = io.StringIO(log_content)
+    
+    # Only the last MAX_AGENT_LOG_LINES lines of either result are kept
+    agent_lines = deque(maxlen=MAX_AGENT_LOG_LINES)
+    tail_lines = deque(maxlen=MAX_AGENT_LOG_LINES)
     
     # Track if we're in an AgentExecutor chain
     in_chain = False
-    collected_lines = []
+    collected_lines = deque(maxlen=MAX_CHAIN_LOG_LINES)
+    # Lines already in collected_lines, for O(1) duplicate checks
+    collected_set = set()
     
-    for i, line in enumerate(lines):
+    for prev_line, line, next_line in _with_neighbors(log_content):
+        tail_lines.append(line)
         line_lower = line.lower()
         
         # Start collecting when we enter an AgentExecutor chain
         if 'entering new agentexecutor chain' in line_lower:
             in_chain = True
-            collected_lines = []
+            collected_lines = deque(maxlen=MAX_CHAIN_LOG_LINES)
+            collected_set = set()
         
         # Check if line contains any relevant pattern
-        if any(pattern.lower() in line_lower for pattern in patterns):
-            collected_lines.append(line)
+        if line_lower.startswith(_AGENT_LOG_PREFIXES) or _AGENT_LOG_RE.search(line_lower):
             # Also include a few lines of context before/after
-            if i > 0 and lines[i-1] not in collected_lines:
+            if (prev_line is not None and prev_line != line and prev_line not in collected_set
+                    and _PREV_CONTEXT_RE.search(prev_line)):
                 # Add previous line if it's relevant
-                prev_line = lines[i-1]
-                if any(keyword in prev_line.lower() for keyword in ['agent', 'tool', 'df.', 'action', 'thought']):
-                    collected_lines.insert(-1, prev_line)
-            if i < len(lines) - 1:
-                next_line = lines[i+1]
-                if any(keyword in next_line.lower() for keyword in ['agent', 'tool', 'df.', 'observation']):
-                    if next_line not in collected_lines:
-                        collected_lines.append(next_line)
+                collected_lines.append(prev_line)
+                collected_set.add(prev_line)
+            collected_lines.append(line)
+            collected_set.add(line)
+            if next_line is not None and _NEXT_CONTEXT_RE.search(next_line):
+                if next_line not in collected_set:
+                    collected_lines.append(next_line)
+                    collected_set.add(next_line)
         
         # Also collect DataFrame-related lines
-        if 'df.' in line or 'dataframe' in line_lower or 'pd.' in line:
-            if line not in collected_lines:
+        if _DF_RE.search(line):
+            if line not in collected_set:
                 collected_lines.append(line)
+                collected_set.add(line)
         
         # Stop collecting after "Finished chain" or "Final Answer"
         if 'finished chain' in line_lower or 'final answer:' in line_lower:
@@ -322,7 +582,8 @@ def extract_agent_executor_logs(log_content: str) -> str:
             if collected_lines:
                 agent_lines.extend(collected_lines)
                 agent_lines.append('')  # Add separator
-                collected_lines = []
+                collected_lines = deque(maxlen=MAX_CHAIN_LOG_LINES)
+                collected_set = set()
     
     # If we have collected lines from active chain, add them
     if collected_lines:
@@ -330,14 +591,348 @@ def extract_agent_executor_logs(log_content: str) -> str:
     
     # Return the extracted logs, prioritizing more recent entries
     if agent_lines:
-        # Get last 500 lines of relevant content
-        return '\n'.join(agent_lines[-500:])
+        return '\n'.join(agent_lines)
     else:
         # Fallback: return last portion of logs that might contain relevant info
-        return '\n'.join(lines[-500:])
+        return '\n'.join(tail_lines)
+
+
+# DataFrame context hints for the tool whose logs are analyzed
+_DF_CONTEXT_HINTS = {
+    "hotel_search": "\n- The DataFrame contains HOTEL data (columns like: name, hotel_class, overall_rating, night_lowest, total_lowest, location_rating, amenities, etc.)",
+    "flight_search": "\n- The DataFrame contains FLIGHT data (columns like: pair_id, total_price, airline, from_out, to_out, depart_time_out, arrive_time_out, duration_min_out, layovers_out, from_ret, to_ret, depart_time_ret, arrive_time_ret, duration_min_ret, layovers_ret, etc.)",
+    "restaurant_search": "\n- The DataFrame contains RESTAURANT data (columns like: name, rating, price, address, cuisine, etc.)",
+}
+
+# Instructions shared by the single-tool and batched prompts
+_ANALYSIS_INSTRUCTIONS = """Please analyze these logs and extract structured information about:
+1. What tools were called and why (from "Action:" and tool execution messages)
+2. What DataFrame operations were performed (from python_repl_ast calls with df.shape, df.sort_values, df.filter, etc.)
+3. The sequence of analysis steps (Thought → Action → Observation cycles)
+4. Key insights about the data processing workflow
+5. **CRITICAL**: Extract detailed action-by-action breakdown with:
+   - Each Thought/Action/Observation cycle from the MOST RECENT execution
+   - The exact action_input (COMPLETE code/query executed) for EACH action
+   - The observation/result returned for EACH action (COMPLETE output)
+   - All DataFrame functions called (df.shape, df.columns, df.sort_values, df.filter, df.groupby, etc.)
+   - DataFrame column names accessed
+   - DataFrame variable names used (df, filtered_df, etc.)
+
+Focus on:
+- Identifying ALL DataFrame operations like df.shape, df.sort_values(), df.filter(), df.groupby(), aggregations, transformations, etc.
+- Extracting the COMPLETE action_input code for each python_repl_ast call (everything between "Action Input:" and "Observation:")
+- Capturing the COMPLETE observation/result text (everything after "Observation:" until the next "Action" or "Thought")
+- Identifying ALL DataFrame column names mentioned in the code
+- Understanding the purpose of each operation from the Thought/Action context
+- Describing the overall data analysis workflow
+- Highlighting key transformations and insights
+
+Look for patterns like:
+- "Action: python_repl_ast"
+- "Action Input:" followed by Python code (may span multiple lines)
+- "Observation:" followed by results/output
+- "Thought:" messages explaining the reasoning
+- DataFrame column names in the code (df['column_name'], df.column_name, etc.)
+- Tool execution messages like "Running FlightSearchTool"
+- "Final Answer:" sections showing successful completions
+
+For each action in the detailed_actions array:
+- Extract the COMPLETE action_input (ALL the code/query between Action Input and Observation, including multi-line code)
+- Extract the COMPLETE observation (ALL the output/result, including multi-line outputs)
+- List ALL df.* function calls (df.shape, df.columns.tolist(), df.sort_values(), df.filter(), etc.)
+- List ALL column names referenced (from df['col'], df.col, or column lists)
+- Include the Thought that preceded the action (if present)
+
+Pay special attention to:
+- Multiple python_repl_ast calls in sequence
+- DataFrame transformations (filtering, sorting, aggregations)
+- Column access patterns (df['column'], df.column, df[['col1', 'col2']])
+- Data exploration steps (df.shape, df.info(), df.describe(), df.value_counts())
+- Final successful outputs (after "Final Answer:")"""
+
+
+# Static instructions for the batched prompt; the per-tool sections go in the user message
+_BATCH_SYSTEM_PROMPT = f"""Analyze the backend logs from an AI agent system given by the user, one section per tool. For EACH tool section, analyze that section on its own.
+
+{_ANALYSIS_INSTRUCTIONS}
+
+Return one analysis per tool section under "analyses", keyed by tool name, using the analyze_trace_ledgers_batch function."""
+
 
+# Log budget per prompt section; about what the old 8000-character slice held
+LOG_TOKEN_BUDGET = 2500
+_LOG_ANCHOR_RE = re.compile(r'Thought:|Action:')
 
-def analyze_backend_logs(log_lines: int = 20000, tool_filter: Optional[str] = None, known_tools: Optional[set] = None) -> Dict[str, Any]:
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    """Local tokenizer for sizing log excerpts, or None if tiktoken is unavailable."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable, trimming logs by characters: {e}")
+        return None
+
+
+def _trim_to_token_budget(text: str, max_tokens: int = LOG_TOKEN_BUDGET) -> str:
+    """
+    Keep the most recent max_tokens tokens of text, starting at a Thought/Action boundary.
+    
+    Counts are from a local tokenizer, which approximates Claude's; without one,
+    falls back to the last 8000 characters.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        trimmed = text[-8000:]
+        if len(trimmed) == len(text):
+            return text
+    else:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        trimmed = encoding.decode(tokens[-max_tokens:])
+    # Don't start mid-cycle: skip ahead to the first Thought/Action in the kept part
+    anchor = _LOG_ANCHOR_RE.search(trimmed)
+    return trimmed[anchor.start():] if anchor else trimmed
+
+
+def _batch_analysis_schema(tool_names: List[str]) -> Dict[str, Any]:
+    """Wrap TRACE_ANALYSIS_SCHEMA so one call returns an analysis per tool."""
+    return {
+        "name": "analyze_trace_ledgers_batch",
+        "description": "Analyze the logs of several tools at once, returning one trace analysis per tool keyed by tool name.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "analyses": {
+                    "type": "object",
+                    "description": "One analysis per tool section, keyed by tool name",
+                    "properties": {
+                        tool_name: TRACE_ANALYSIS_SCHEMA["input_schema"] for tool_name in tool_names
+                    },
+                    "required": list(tool_names)
+                }
+            },
+            "required": ["analyses"]
+        }
+    }
+
+
+def _tool_focus_block(tool_filter: Optional[str]) -> str:
+    """The IMPORTANT block telling the model which tool's execution to focus on."""
+    tool_context = f" for the '{tool_filter}' tool" if tool_filter else ""
+    df_context_hint = _DF_CONTEXT_HINTS.get(tool_filter, "")
+    return f"""IMPORTANT: 
+- Focus on the MOST RECENT execution chains{tool_context if tool_filter else ""}
+- Look for complete Thought/Action/Observation cycles{df_context_hint}
+- Identify the DataFrame context correctly - for hotel_search, look for hotel data; for flight_search, look for flight data; for restaurant_search, look for restaurant data
+- DO NOT confuse DataFrames from different tools - only analyze DataFrame operations that are relevant to {tool_filter if tool_filter else "the current tool"}"""
+
+
+def _extract_tool_input(response: Any) -> Optional[Dict[str, Any]]:
+    """Return the tool_use input of an Anthropic response, or a JSON object parsed from its text."""
+    if response.content and len(response.content) > 0:
+        block = response.content[0]
+        if hasattr(block, 'type') and block.type == 'tool_use':
+            if hasattr(block, 'input'):
+                return block.input
+        elif hasattr(block, 'text'):
+            # Fallback: parse the JSON object out of the text (may be wrapped in prose)
+            return extract_json_object(block.text)
+    return None
+
+
+# Lowercased log lines marking the start of each tool's execution
+_TOOL_MARKERS = {
+    'flight_search': (
+        '✈️ running flightsearchtool',
+        'running flightsearchtool',
+        'flightsearchtool',
+        'running flight_search'
+    ),
+    'hotel_search': (
+        '🏨 running hotelsearchtool',
+        'running hotelsearchtool',
+        'hotelsearchtool',
+        'making hotel search request',
+        'running hotel_search'
+    ),
+    'restaurant_search': (
+        '🍴 running restaurantsearchtool',
+        'running restaurantsearchtool',
+        'restaurantsearchtool',
+        'making restaurant search request',
+        'running restaurant_search'
+    )
+}
+
+
+def _find_latest_tool_starts(all_logs_lower: str, tool_names) -> Dict[str, int]:
+    """
+    Find the line of each tool's most recent marker in the lowercased logs.
+    
+    Returns:
+        Index of the most recent marker line per tool; tools without a marker are absent
+    """
+    starts = {}
+    for tool_name in tool_names:
+        markers = _TOOL_MARKERS.get(tool_name, (tool_name.lower(),))
+        # CRITICAL FIX: search from the END to find the MOST RECENT execution
+        # This prevents picking up old/cached runs from earlier in the logs
+        idx = max(all_logs_lower.rfind(marker) for marker in markers)
+        if idx != -1:
+            starts[tool_name] = all_logs_lower.count('\n', 0, idx)
+    return starts
+
+
+def _slice_tool_logs(raw_lines: List[str], tool_name: str, tool_start_idx: int) -> str:
+    """Extract the AgentExecutor logs in a window starting at a tool's marker line."""
+    # Get context starting from the tool marker going forward
+    # We don't need much before, but we need enough after to capture the chain
+    start = max(0, tool_start_idx - 10)
+    end = min(len(raw_lines), tool_start_idx + 2500) # Increased window size
+    relevant_section = '\n'.join(raw_lines[start:end])
+    logger.info(f"Extracted {end - start} lines starting at {tool_name} execution")
+    
+    # Now extract AgentExecutor logs from this section
+    agent_logs = extract_agent_executor_logs(relevant_section)
+    logger.info(f"After extraction for {tool_name}, agent_logs chars: {len(agent_logs)}")
+    
+    if len(agent_logs) < 100:
+        logger.warning(f"AgentExecutor logs extracted for {tool_name} seem too short ({len(agent_logs)} chars).")
+    return agent_logs
+
+
+def _slice_found_tools(all_logs: str, tool_names) -> Dict[str, str]:
+    """Slice the AgentExecutor logs of each tool whose marker is in all_logs."""
+    starts = _find_latest_tool_starts(all_logs.lower(), tool_names)
+    raw_lines = all_logs.split('\n') if starts else []
+    found_logs = {}
+    for tool_name, tool_start_idx in starts.items():
+        logger.info(f"Found {tool_name} tool execution at line {tool_start_idx}")
+        found_logs[tool_name] = _slice_tool_logs(raw_lines, tool_name, tool_start_idx)
+    return found_logs
+
+
+def _collect_tool_logs(all_logs: str, tool_names, log_lines: int) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    Slice each tool's AgentExecutor logs out of the backend logs.
+    
+    Markers are searched for in all_logs first; only tools whose marker is not
+    there cause one wider read of MARKER_SEARCH_LOG_LINES lines.
+    
+    Args:
+        all_logs: Raw logs (the last log_lines lines), read once for all tools
+        tool_names: Tools to slice out
+        log_lines: Number of lines all_logs was read with
+    
+    Returns:
+        (agent logs keyed by tool name, error results for tools with nothing to analyze)
+    """
+    found_logs = _slice_found_tools(all_logs, tool_names)
+    searched_lines = log_lines
+    missing = [tool_name for tool_name in tool_names if tool_name not in found_logs]
+    if missing and log_lines < MARKER_SEARCH_LOG_LINES:
+        logger.info(f"No marker for {missing} in the last {log_lines} lines; searching the last {MARKER_SEARCH_LOG_LINES}...")
+        searched_lines = MARKER_SEARCH_LOG_LINES
+        found_logs.update(_slice_found_tools(get_recent_backend_logs(lines=searched_lines), missing))
+    
+    tool_logs = {}
+    errors = {}
+    for tool_name in tool_names:
+        if tool_name not in found_logs:
+            logger.warning(f"Tool marker not found for {tool_name} in raw logs.")
+            # CRITICAL FIX: Do NOT fallback to general extraction if tool marker not found.
+            # Returning general logs (which likely contain OTHER tools) causes incorrect analysis.
+            errors[tool_name] = {"error": f"No logs found for tool {tool_name} in the last {searched_lines} lines."}
+        elif not found_logs[tool_name]:
+            errors[tool_name] = {"error": "No AgentExecutor activity found in logs"}
+        else:
+            tool_logs[tool_name] = found_logs[tool_name]
+    return tool_logs, errors
+
+
+# Tool mentions in the logs: "Running FlightSearchTool", "Action: hotel_search", "restaurant search", ...
+_TOOL_DETECT_RE = re.compile(r'\b(flight|hotel|restaurant)[_ ]?search', re.IGNORECASE)
+_TOOL_SAMPLE_RE = re.compile(r'running|action:|hotel|restaurant|flight', re.IGNORECASE)
+
+
+def _detect_tool_names(agent_logs: str, all_logs: str, known_tools: Optional[set]) -> set:
+    """Identify the tools that ran, from the trace ledger and the extracted/raw logs."""
+    # Start with known tools from trace ledger (most reliable)
+    tool_names = set(known_tools) if known_tools else set()
+    logger.info(f"Starting with known tools from trace ledger: {tool_names}")
+    
+    # Debug: log sample lines to understand what we're seeing
+    sample_lines = [l for l in agent_logs.split('\n') if _TOOL_SAMPLE_RE.search(l)]
+    logger.info(f"Sample log lines with tool keywords ({len(sample_lines)} found): {sample_lines[:10]}")
+    
+    # Also extract tool names from logs (look for "Running XTool" or "Action: X")
+    # This is a fallback/complement to trace ledger
+    tool_names.update(f"{m.group(1).lower()}_search" for m in _TOOL_DETECT_RE.finditer(agent_logs))
+    
+    logger.info(f"Tools detected (from logs + trace ledger): {tool_names}")
+    if not tool_names:
+        logger.warning("No tools detected. Checking raw logs for tool patterns...")
+        # Fallback: check the last 500 lines of the raw logs too
+        tool_names.update(f"{m.group(1).lower()}_search" for m in _TOOL_DETECT_RE.finditer(_last_lines(all_logs, 500)))
+        logger.info(f"After checking raw logs, tools detected: {tool_names}")
+    
+    # If we have known tools from ledger but no logs found, still analyze them
+    if known_tools and not tool_names:
+        logger.info(f"Using known tools from trace ledger since no tools found in logs: {known_tools}")
+        tool_names = known_tools
+    
+    return tool_names
+
+
+def _analyze_tools_batch(client: anthropic.Anthropic, tool_logs: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Analyze several tools in one Anthropic call.
+    
+    The instructions and schema are sent once, with one labeled log section
+    per tool; the model returns an analysis per tool under "analyses".
+    """
+    tool_names = list(tool_logs)
+    sections = "\n\n".join(
+        f"=== TOOL: {tool_name} ===\n{_tool_focus_block(tool_name)}\n\nBackend Logs:\n{_trim_to_token_budget(agent_logs)}"
+        for tool_name, agent_logs in tool_logs.items()
+    )
+    prompt = f"""The logs are split into one section per tool ({", ".join(tool_names)}). Each section contains AgentExecutor messages showing Thought/Action/Observation cycles, tool calls, and DataFrame operations for that tool only.
+
+{sections}"""
+
+    response = client.messages.create(
+        model="claude-sonnet-4-5",
+        max_tokens=4096 * len(tool_names),
+        system=[
+            {"type": "text", "text": _BATCH_SYSTEM_PROMPT, "cache_control": _EPHEMERAL_CACHE}
+        ],
+        tools=[_batch_analysis_schema(tool_names)],
+        tool_choice={"type": "tool", "name": "analyze_trace_ledgers_batch"},
+        messages=[
+            {"role": "user", "content": prompt}
+        ]
+    )
+    
+    parsed = _extract_tool_input(response) or {}
+    analyses = parsed.get("analyses")
+    if not isinstance(analyses, dict):
+        return {tool_name: {"error": "Failed to extract analysis from LLM response"} for tool_name in tool_names}
+    return {
+        tool_name: _as_trace_analysis(analyses.get(tool_name)) or {"error": "Empty analysis result"}
+        for tool_name in tool_names
+    }
+
+
+def analyze_backend_logs(
+    log_lines: int = 20000,
+    tool_filter: Optional[str] = None,
+    known_tools: Optional[set] = None,
+    use_batch: bool = False
+) -> Dict[str, Any]:
     """
     Analyze backend logs using LLM to extract structured information about
     AgentExecutor actions, tool calls, and DataFrame operations.
@@ -347,6 +942,7 @@ def analyze_backend_logs(log_lines: int = 20000, tool_filter: Optional[str] = No
         tool_filter: Optional tool name to filter logs for (e.g., 'hotel_search', 'flight_search')
                     If None, analyzes all tools and returns results grouped by tool
         known_tools: Optional set of tool names from trace ledger (more reliable than log parsing)
+        use_batch: Analyze multiple tools through the Message Batches API (cheaper, not interactive)
         
     Returns:
         If tool_filter is provided: Structured analysis for that specific tool
@@ -358,9 +954,9 @@ def analyze_backend_logs(log_lines: int = 20000, tool_filter: Optional[str] = No
             logger.error("ANTHROPIC_API_KEY not found in environment")
             return {"error": "API key not configured"}
         
-        client = anthropic.Anthropic(api_key=api_key)
+        client = _get_client()
         
-        # Get recent backend logs
+        # Get recent backend logs; tool markers outside them are searched for separately
         logger.info(f"Reading last {log_lines} lines from backend logs...")
         all_logs = get_recent_backend_logs(lines=log_lines)
         
@@ -369,89 +965,12 @@ def analyze_backend_logs(log_lines: int = 20000, tool_filter: Optional[str] = No
         
         # If tool_filter is provided, we'll filter from raw logs first, then extract
         # This ensures we capture the right AgentExecutor chain for the tool
-        used_relevant_section = False
         if tool_filter:
-            # Filter raw logs first to find the relevant section
-            tool_lower = tool_filter.lower()
-            tool_markers = {
-                'flight_search': [
-                    '✈️ running flightsearchtool',
-                    'running flightsearchtool',
-                    'flightsearchtool',
-                    'running flight_search'
-                ],
-                'hotel_search': [
-                    '🏨 running hotelsearchtool',
-                    'running hotelsearchtool',
-                    'hotelsearchtool',
-                    'making hotel search request',
-                    'running hotel_search'
-                ],
-                'restaurant_search': [
-                    '🍴 running restaurantsearchtool',
-                    'running restaurantsearchtool',
-                    'restaurantsearchtool',
-                    'making restaurant search request',
-                    'running restaurant_search'
-                ]
-            }
-            markers = tool_markers.get(tool_filter, [tool_lower])
-            
-            # Find the tool execution in raw logs
-            raw_lines = all_logs.split('\n')
-            tool_start_idx = None
-            
-            # CRITICAL FIX: Search from the BOTTOM up to find the MOST RECENT execution
-            # This prevents picking up old/cached runs from earlier in the logs
-            for i in range(len(raw_lines) - 1, -1, -1):
-                line = raw_lines[i]
-                line_lower = line.lower()
-                for marker in markers:
-                    if marker.lower() in line_lower:
-                        tool_start_idx = i
-                        logger.info(f"Found {tool_filter} tool execution at line {i} (scanning from bottom)")
-                        break
-                if tool_start_idx is not None:
-                    break
-            
-            # If not found, try expanding the log window once
-            if tool_start_idx is None and log_lines < 30000:
-                logger.info(f"No marker found for {tool_filter} with {log_lines} lines. Expanding to 30000 lines.")
-                all_logs = get_recent_backend_logs(lines=30000)
-                raw_lines = all_logs.split('\n')
-                # Try search again from bottom
-                for i in range(len(raw_lines) - 1, -1, -1):
-                    line = raw_lines[i]
-                    line_lower = line.lower()
-                    for marker in markers:
-                        if marker.lower() in line_lower:
-                            tool_start_idx = i
-                            logger.info(f"Found {tool_filter} tool execution at line {i} after expansion")
-                            break
-                    if tool_start_idx is not None:
-                        break
-            
-            # If we found the tool, extract a window around it (forward only)
-            if tool_start_idx is not None:
-                # Get context starting from the tool marker going forward
-                # We don't need much before, but we need enough after to capture the chain
-                start = max(0, tool_start_idx - 10) 
-                end = min(len(raw_lines), tool_start_idx + 2500) # Increased window size
-                relevant_section = '\n'.join(raw_lines[start:end])
-                logger.info(f"Extracted {end - start} lines starting at {tool_filter} execution")
-                
-                # Now extract AgentExecutor logs from this section
-                agent_logs = extract_agent_executor_logs(relevant_section)
-                used_relevant_section = True
-                logger.info(f"After extraction for {tool_filter}, agent_logs chars: {len(agent_logs)}")
-                
-                if len(agent_logs) < 100:
-                     logger.warning(f"AgentExecutor logs extracted for {tool_filter} seem too short ({len(agent_logs)} chars).")
-            else:
-                logger.warning(f"Tool marker not found for {tool_filter} in raw logs.")
-                # CRITICAL FIX: Do NOT fallback to general extraction if tool marker not found.
-                # Returning general logs (which likely contain OTHER tools) causes incorrect analysis.
-                return {"error": f"No logs found for tool {tool_filter} in the last {log_lines} lines."}
+            tool_logs, errors = _collect_tool_logs(all_logs, [tool_filter], log_lines)
+            if errors:
+                return errors[tool_filter]
+            agent_logs = tool_logs[tool_filter]
+            logger.info(f"Using extracted section directly for {tool_filter} (skipping secondary filtering)")
         else:
             # Extract AgentExecutor-related logs
             agent_logs = extract_agent_executor_logs(all_logs)
@@ -460,98 +979,32 @@ def analyze_backend_logs(log_lines: int = 20000, tool_filter: Optional[str] = No
             logger.warning("No AgentExecutor logs found in recent backend output")
             return {"error": "No AgentExecutor activity found in logs"}
         
-        # If tool_filter is provided and we already used a relevant section, skip further filtering
-        if tool_filter and used_relevant_section:
-            logger.info(f"Using extracted section directly for {tool_filter} (skipping secondary filtering)")
-        elif tool_filter:
-            # We should not reach here if used_relevant_section is False because we return early above
-            pass
-        
         logger.info(f"Extracted {len(agent_logs)} characters of AgentExecutor logs")
         
         # If no tool_filter, we need to analyze all tools and group by tool
         # First, identify all tools in the logs
         if not tool_filter:
-            # Start with known tools from trace ledger (most reliable)
-            tool_names = set(known_tools) if known_tools else set()
-            logger.info(f"Starting with known tools from trace ledger: {tool_names}")
+            tool_names = _detect_tool_names(agent_logs, all_logs, known_tools)
             
-            # Also extract tool names from logs (look for "Running XTool" or "Action: X")
-            # This is a fallback/complement to trace ledger
-            lines = agent_logs.split('\n')
+            if len(tool_names) > 1 and use_batch:
+                logger.info(f"Found {len(tool_names)} tools in logs: {tool_names}. Submitting a message batch...")
+                return analyze_backend_logs_batch(list(tool_names), log_lines=log_lines)
             
-            # Debug: log sample lines to understand what we're seeing
-            sample_lines = [l for l in lines if any(keyword in l.lower() for keyword in ['running', 'action:', 'hotel', 'restaurant', 'flight'])]
-            logger.info(f"Sample log lines with tool keywords ({len(sample_lines)} found): {sample_lines[:10]}")
-            
-            for line in lines:
-                line_lower = line.lower()
-                # Check for "Running XTool" pattern (with or without emoji prefix)
-                if 'running' in line_lower:
-                    # Extract tool name from "Running FlightSearchTool" or "Running HotelSearchTool"
-                    # Handle emoji prefixes (✈️, 🏨, 🍴) and case variations
-                    if 'flightsearchtool' in line_lower or 'flight_search' in line_lower or ('flight' in line_lower and 'search' in line_lower):
-                        tool_names.add('flight_search')
-                    elif 'hotelsearchtool' in line_lower or 'hotel_search' in line_lower or ('hotel' in line_lower and 'search' in line_lower):
-                        tool_names.add('hotel_search')
-                    elif 'restaurantsearchtool' in line_lower or 'restaurant_search' in line_lower or ('restaurant' in line_lower and 'search' in line_lower):
-                        tool_names.add('restaurant_search')
-                
-                # Also check for explicit tool calls in Action lines
-                if 'action:' in line_lower:
-                    if 'flight_search' in line_lower:
-                        tool_names.add('flight_search')
-                    elif 'hotel_search' in line_lower:
-                        tool_names.add('hotel_search')
-                    elif 'restaurant_search' in line_lower:
-                        tool_names.add('restaurant_search')
-                
-                # Also check for tool names in ReActCallback or other log patterns
-                if 'reactcallback' in line_lower or 'agent action' in line_lower:
-                    if 'flight_search' in line_lower:
-                        tool_names.add('flight_search')
-                    elif 'hotel_search' in line_lower:
-                        tool_names.add('hotel_search')
-                    elif 'restaurant_search' in line_lower:
-                        tool_names.add('restaurant_search')
-            
-            logger.info(f"Tools detected (from logs + trace ledger): {tool_names}")
-            if not tool_names:
-                logger.warning("No tools detected. Checking raw logs for tool patterns...")
-                # Fallback: check raw logs too
-                raw_lines = all_logs.split('\n')
-                for line in raw_lines[-500:]:  # Check last 500 lines of raw logs
-                    line_lower = line.lower()
-                    if 'flight_search' in line_lower or ('flight' in line_lower and 'search' in line_lower and 'tool' in line_lower):
-                        tool_names.add('flight_search')
-                    if 'hotel_search' in line_lower or ('hotel' in line_lower and 'search' in line_lower and 'tool' in line_lower):
-                        tool_names.add('hotel_search')
-                    if 'restaurant_search' in line_lower or ('restaurant' in line_lower and 'search' in line_lower and 'tool' in line_lower):
-                        tool_names.add('restaurant_search')
-                logger.info(f"After checking raw logs, tools detected: {tool_names}")
-            
-            # If we have known tools from ledger but no logs found, still analyze them
-            if known_tools and not tool_names:
-                logger.info(f"Using known tools from trace ledger since no tools found in logs: {known_tools}")
-                tool_names = known_tools
-            
-            # If we found multiple tools, analyze each separately
+            # If we found multiple tools, analyze them together in one batched call
             if len(tool_names) > 1:
-                logger.info(f"Found {len(tool_names)} tools in logs: {tool_names}. Analyzing each separately...")
-                results_by_tool = {}
-                for tool_name in tool_names:
+                logger.info(f"Found {len(tool_names)} tools in logs: {tool_names}. Analyzing them in one batch...")
+                tool_logs, results_by_tool = _collect_tool_logs(all_logs, tool_names, log_lines)
+                
+                if len(tool_logs) > 1:
                     try:
-                        logger.info(f"Analyzing tool: {tool_name}")
-                        tool_analysis = analyze_backend_logs(log_lines=log_lines, tool_filter=tool_name, known_tools=known_tools)
-                        if tool_analysis and 'error' not in tool_analysis:
-                            results_by_tool[tool_name] = tool_analysis
-                            logger.info(f"Successfully analyzed {tool_name}")
-                        else:
-                            logger.warning(f"Analysis for {tool_name} returned error or empty result: {tool_analysis}")
-                            results_by_tool[tool_name] = tool_analysis or {"error": "Empty analysis result"}
+                        results_by_tool.update(_analyze_tools_batch(client, tool_logs))
                     except Exception as e:
-                        logger.error(f"Error analyzing tool {tool_name}: {e}", exc_info=True)
-                        results_by_tool[tool_name] = {"error": str(e)}
+                        logger.error(f"Error in batched analysis of {list(tool_logs)}: {e}", exc_info=True)
+                        results_by_tool.update({tool_name: {"error": str(e)} for tool_name in tool_logs})
+                elif tool_logs:
+                    # Only one tool had logs; the single-tool prompt is enough
+                    tool_name = next(iter(tool_logs))
+                    results_by_tool[tool_name] = _analyze_slice(client, tool_name, tool_logs[tool_name])
                 logger.info(f"Completed analysis for {len(results_by_tool)} tools: {list(results_by_tool.keys())}")
                 return results_by_tool
             # If only one tool or no tools found, continue with single analysis
@@ -561,100 +1014,290 @@ def analyze_backend_logs(log_lines: int = 20000, tool_filter: Optional[str] = No
             else:
                 logger.warning("No tools detected. Proceeding with general analysis...")
         
-        # Build prompt - identify which tool we're analyzing
-        tool_context = f" for the '{tool_filter}' tool" if tool_filter else ""
+        return _analyze_slice(client, tool_filter, agent_logs)
         
-        # Add DataFrame context hints based on tool
-        df_context_hint = ""
-        if tool_filter == "hotel_search":
-            df_context_hint = "\n- The DataFrame contains HOTEL data (columns like: name, hotel_class, overall_rating, night_lowest, total_lowest, location_rating, amenities, etc.)"
-        elif tool_filter == "flight_search":
-            df_context_hint = "\n- The DataFrame contains FLIGHT data (columns like: pair_id, total_price, airline, from_out, to_out, depart_time_out, arrive_time_out, duration_min_out, layovers_out, from_ret, to_ret, depart_time_ret, arrive_time_ret, duration_min_ret, layovers_ret, etc.)"
-        elif tool_filter == "restaurant_search":
-            df_context_hint = "\n- The DataFrame contains RESTAURANT data (columns like: name, rating, price, address, cuisine, etc.)"
+    except Exception as e:
+        logger.error(f"Error analyzing backend logs: {e}", exc_info=True)
+        return {"error": str(e)}
+
+
+# Marks the static prefix (tool schema + instructions) for Anthropic prompt caching
+_EPHEMERAL_CACHE = {"type": "ephemeral"}
+_CACHED_TRACE_ANALYSIS_TOOL = {**TRACE_ANALYSIS_SCHEMA, "cache_control": _EPHEMERAL_CACHE}
+
+
+@functools.lru_cache(maxsize=8)
+def _analysis_system_prompt(tool_filter: Optional[str]) -> str:
+    """
+    Static instructions for analyzing one tool's logs.
+    
+    Only the logs change between calls, so everything else lives here, one
+    variant per tool, and is sent as a cached system block.
+    """
+    # Build prompt - identify which tool we're analyzing
+    tool_context = f" for the '{tool_filter}' tool" if tool_filter else ""
+    
+    return f"""Analyze the backend logs from an AI agent system{tool_context} given by the user. The logs contain AgentExecutor messages showing Thought/Action/Observation cycles, tool calls, and DataFrame operations.
+
+{_tool_focus_block(tool_filter)}
+
+{_ANALYSIS_INSTRUCTIONS}
+
+Return your analysis using the analyze_trace_ledger function."""
+
+
+def _analysis_request(tool_filter: Optional[str], agent_logs: str) -> Dict[str, Any]:
+    """Build the messages.create params for analyzing one tool's logs (or all tools if tool_filter is None)."""
+    return {
+        "model": "claude-sonnet-4-5",
+        "max_tokens": 4096,
+        "system": [
+            {"type": "text", "text": _analysis_system_prompt(tool_filter), "cache_control": _EPHEMERAL_CACHE}
+        ],
+        "tools": [_CACHED_TRACE_ANALYSIS_TOOL],
+        "tool_choice": {"type": "tool", "name": "analyze_trace_ledger"},
+        "messages": [
+            {"role": "user", "content": f"Backend Logs:\n{_trim_to_token_budget(agent_logs)}"}
+        ]
+    }
+
+
+def _analyze_slice(client: anthropic.Anthropic, tool_filter: Optional[str], agent_logs: str) -> Dict[str, Any]:
+    """Analyze the extracted AgentExecutor logs of one tool (or of all tools if tool_filter is None)."""
+    response = client.messages.create(**_analysis_request(tool_filter, agent_logs))
+    
+    analysis = _as_trace_analysis(_extract_tool_input(response))
+    if analysis is not None:
+        return analysis
+    
+    return {"error": "Failed to extract analysis from LLM response"}
+
+
+def _run_message_batch(
+    client: anthropic.Anthropic,
+    requests: Dict[str, Dict[str, Any]],
+    poll_interval: float,
+    timeout: float
+) -> Dict[str, Any]:
+    """
+    Submit requests through the Message Batches API and wait for the results.
+    
+    Args:
+        client: Anthropic client
+        requests: messages.create params keyed by custom_id (the tool name)
+        poll_interval: Seconds between status checks
+        timeout: Seconds to wait before cancelling the batch
         
-        prompt = f"""Analyze the following backend logs from an AI agent system{tool_context}. The logs contain AgentExecutor messages showing Thought/Action/Observation cycles, tool calls, and DataFrame operations.
+    Returns:
+        Analysis (or {"error": ...}) keyed by custom_id
+    """
+    batch = client.messages.batches.create(
+        requests=[{"custom_id": custom_id, "params": params} for custom_id, params in requests.items()]
+    )
+    logger.info(f"Submitted message batch {batch.id} with {len(requests)} requests")
+    
+    deadline = time.monotonic() + timeout
+    while batch.processing_status != "ended":
+        if time.monotonic() >= deadline:
+            client.messages.batches.cancel(batch.id)
+            raise TimeoutError(f"Message batch {batch.id} did not finish within {timeout}s")
+        time.sleep(poll_interval)
+        batch = client.messages.batches.retrieve(batch.id)
+    
+    results = {}
+    for entry in client.messages.batches.results(batch.id):
+        if entry.result.type == "succeeded":
+            analysis = _as_trace_analysis(_extract_tool_input(entry.result.message))
+            results[entry.custom_id] = analysis if analysis is not None else {"error": "Failed to extract analysis from LLM response"}
+        else:
+            results[entry.custom_id] = {"error": f"Batch request {entry.result.type}"}
+    for custom_id in requests:
+        results.setdefault(custom_id, {"error": "Missing from batch results"})
+    return results
 
-IMPORTANT: 
-- Focus on the MOST RECENT execution chains{tool_context if tool_filter else ""}
-- Look for complete Thought/Action/Observation cycles{df_context_hint}
-- Identify the DataFrame context correctly - for hotel_search, look for hotel data; for flight_search, look for flight data; for restaurant_search, look for restaurant data
-- DO NOT confuse DataFrames from different tools - only analyze DataFrame operations that are relevant to {tool_filter if tool_filter else "the current tool"}
 
-Backend Logs:
-{agent_logs[-8000:]}
+def analyze_backend_logs_batch(
+    tool_filters: List[str],
+    log_lines: int = 20000,
+    poll_interval: float = 10.0,
+    timeout: float = 3600.0
+) -> Dict[str, Any]:
+    """
+    Analyze several tools through the Message Batches API.
+    
+    Batches are billed at half the online rate but can take minutes to
+    complete, so use this for post-hoc log review rather than on a path a
+    user is waiting on. Falls back to one messages.create per tool if the
+    batch cannot be submitted.
+    
+    Args:
+        tool_filters: Tool names to analyze (e.g., ['hotel_search', 'flight_search'])
+        log_lines: Number of recent log lines to analyze
+        poll_interval: Seconds between batch status checks
+        timeout: Seconds to wait for the batch before giving up
+        
+    Returns:
+        Dict with keys as tool names, values as analysis results
+    """
+    try:
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        if not api_key:
+            logger.error("ANTHROPIC_API_KEY not found in environment")
+            return {"error": "API key not configured"}
+        
+        client = _get_client()
+        
+        logger.info(f"Reading last {log_lines} lines from backend logs...")
+        all_logs = get_recent_backend_logs(lines=log_lines)
+        
+        if not all_logs:
+            return {"error": "Could not retrieve backend logs. Make sure backend.log exists or logs are accessible."}
+        
+        tool_logs, results_by_tool = _collect_tool_logs(all_logs, tool_filters, log_lines)
+        requests = {
+            tool_name: _analysis_request(tool_name, agent_logs)
+            for tool_name, agent_logs in tool_logs.items()
+        }
+        
+        if not requests:
+            return results_by_tool
+        
+        try:
+            results_by_tool.update(_run_message_batch(client, requests, poll_interval, timeout))
+        except (anthropic.APIError, AttributeError) as e:
+            # Batches unavailable (older SDK or API error): analyze each tool online
+            logger.warning(f"Message batch failed ({e}); falling back to messages.create per tool")
+            for tool_name, params in requests.items():
+                try:
+                    analysis = _as_trace_analysis(_extract_tool_input(client.messages.create(**params)))
+                    results_by_tool[tool_name] = analysis if analysis is not None else {"error": "Failed to extract analysis from LLM response"}
+                except Exception as tool_error:
+                    logger.error(f"Error analyzing tool {tool_name}: {tool_error}", exc_info=True)
+                    results_by_tool[tool_name] = {"error": str(tool_error)}
+        
+        logger.info(f"Completed batch analysis for {len(results_by_tool)} tools: {list(results_by_tool.keys())}")
+        return results_by_tool
+        
+    except Exception as e:
+        logger.error(f"Error analyzing backend logs in batch: {e}", exc_info=True)
+        return {"error": str(e)}
 
-Please analyze these logs and extract structured information about:
-1. What tools were called and why (from "Action:" and tool execution messages)
-2. What DataFrame operations were performed (from python_repl_ast calls with df.shape, df.sort_values, df.filter, etc.)
-3. The sequence of analysis steps (Thought → Action → Observation cycles)
-4. Key insights about the data processing workflow
-5. **CRITICAL**: Extract detailed action-by-action breakdown with:
-   - Each Thought/Action/Observation cycle from the MOST RECENT execution
-   - The exact action_input (COMPLETE code/query executed) for EACH action
-   - The observation/result returned for EACH action (COMPLETE output)
-   - All DataFrame functions called (df.shape, df.columns, df.sort_values, df.filter, df.groupby, etc.)
-   - DataFrame column names accessed
-   - DataFrame variable names used (df, filtered_df, etc.)
 
-Focus on:
-- Identifying ALL DataFrame operations like df.shape, df.sort_values(), df.filter(), df.groupby(), aggregations, transformations, etc.
-- Extracting the COMPLETE action_input code for each python_repl_ast call (everything between "Action Input:" and "Observation:")
-- Capturing the COMPLETE observation/result text (everything after "Observation:" until the next "Action" or "Thought")
-- Identifying ALL DataFrame column names mentioned in the code
-- Understanding the purpose of each operation from the Thought/Action context
-- Describing the overall data analysis workflow
-- Highlighting key transformations and insights
+@functools.lru_cache(maxsize=1)
+def _get_client() -> anthropic.Anthropic:
+    """Process-wide Anthropic client, so repeated analyses reuse one connection pool."""
+    return anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 
-Look for patterns like:
-- "Action: python_repl_ast"
-- "Action Input:" followed by Python code (may span multiple lines)
-- "Observation:" followed by results/output
-- "Thought:" messages explaining the reasoning
-- DataFrame column names in the code (df['column_name'], df.column_name, etc.)
-- Tool execution messages like "Running FlightSearchTool"
-- "Final Answer:" sections showing successful completions
 
-For each action in the detailed_actions array:
-- Extract the COMPLETE action_input (ALL the code/query between Action Input and Observation, including multi-line code)
-- Extract the COMPLETE observation (ALL the output/result, including multi-line outputs)
-- List ALL df.* function calls (df.shape, df.columns.tolist(), df.sort_values(), df.filter(), etc.)
-- List ALL column names referenced (from df['col'], df.col, or column lists)
-- Include the Thought that preceded the action (if present)
+# Bounds concurrent per-tool analyses so a burst of tools doesn't trip rate limits
+ANALYSIS_MAX_CONCURRENCY = 5
 
-Pay special attention to:
-- Multiple python_repl_ast calls in sequence
-- DataFrame transformations (filtering, sorting, aggregations)
-- Column access patterns (df['column'], df.column, df[['col1', 'col2']])
-- Data exploration steps (df.shape, df.info(), df.describe(), df.value_counts())
-- Final successful outputs (after "Final Answer:")
+# Async client and semaphore per event loop; both are bound to the loop they are
+# first used on, so analyses run from another loop get their own pair
+_loop_analysis: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple[anthropic.AsyncAnthropic, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
 
-Return your analysis using the analyze_trace_ledger function."""
 
-        response = client.messages.create(
-            model="claude-sonnet-4-5",
-            max_tokens=4096,
-            tools=[TRACE_ANALYSIS_SCHEMA],
-            tool_choice={"type": "tool", "name": "analyze_trace_ledger"},
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+def _get_loop_analysis() -> Tuple[anthropic.AsyncAnthropic, asyncio.Semaphore]:
+    """The running loop's async Anthropic client and analysis semaphore, created on first use."""
+    loop = asyncio.get_running_loop()
+    pair = _loop_analysis.get(loop)
+    if pair is None:
+        pair = _loop_analysis[loop] = (
+            anthropic.AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY")),
+            asyncio.Semaphore(ANALYSIS_MAX_CONCURRENCY),
         )
+    return pair
+
+
+def _get_async_client() -> anthropic.AsyncAnthropic:
+    """The running loop's async Anthropic client, so concurrent analyses share one connection pool."""
+    return _get_loop_analysis()[0]
+
+
+@retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential_jitter(initial=1, max=16),
+    retry=retry_if_exception_type(
+        (anthropic.RateLimitError, anthropic.APITimeoutError, anthropic.InternalServerError)
+    ),
+    reraise=True,
+)
+async def _analyze_one(client: anthropic.AsyncAnthropic, tool_filter: Optional[str], agent_logs: str) -> Dict[str, Any]:
+    """Analyze one tool's log slice, retrying rate limits and transient errors."""
+    async with _get_loop_analysis()[1]:
+        response = await client.messages.create(**_analysis_request(tool_filter, agent_logs))
+    
+    analysis = _as_trace_analysis(_extract_tool_input(response))
+    if analysis is not None:
+        return analysis
+    
+    return {"error": "Failed to extract analysis from LLM response"}
+
+
+async def analyze_backend_logs_async(
+    log_lines: int = 20000,
+    tool_filter: Optional[str] = None,
+    known_tools: Optional[set] = None
+) -> Dict[str, Any]:
+    """
+    Async analyze_backend_logs that analyzes each tool in its own concurrent call.
+    
+    Unlike the batched prompt in analyze_backend_logs, every tool keeps its own
+    prompt and schema; the calls run concurrently, so latency is that of the
+    slowest tool rather than the sum.
+    
+    Args:
+        log_lines: Number of recent log lines to analyze
+        tool_filter: Optional tool name to filter logs for
+        known_tools: Optional set of tool names from trace ledger
         
-        # Extract tool use result
-        if response.content and len(response.content) > 0:
-            block = response.content[0]
-            if hasattr(block, 'type') and block.type == 'tool_use':
-                if hasattr(block, 'input'):
-                    return block.input
-            elif hasattr(block, 'text'):
-                # Fallback: try to parse JSON from text
-                try:
-                    return json.loads(block.text)
-                except:
-                    pass
+    Returns:
+        Same shape as analyze_backend_logs
+    """
+    try:
+        if not os.getenv("ANTHROPIC_API_KEY"):
+            logger.error("ANTHROPIC_API_KEY not found in environment")
+            return {"error": "API key not configured"}
+        
+        client = _get_async_client()
         
-        return {"error": "Failed to extract analysis from LLM response"}
+        # Log reading and extraction are blocking; keep them off the event loop
+        logger.info(f"Reading last {log_lines} lines from backend logs...")
+        all_logs = await asyncio.to_thread(get_recent_backend_logs, log_lines)
+        
+        if not all_logs:
+            return {"error": "Could not retrieve backend logs. Make sure backend.log exists or logs are accessible."}
+        
+        if tool_filter:
+            tool_names = {tool_filter}
+        else:
+            agent_logs = await asyncio.to_thread(extract_agent_executor_logs, all_logs)
+            if not agent_logs:
+                logger.warning("No AgentExecutor logs found in recent backend output")
+                return {"error": "No AgentExecutor activity found in logs"}
+            tool_names = _detect_tool_names(agent_logs, all_logs, known_tools)
+            if len(tool_names) <= 1:
+                # Same as the sync path: one tool (or none) is analyzed over the general extraction
+                single_tool = next(iter(tool_names), None)
+                return await _analyze_one(client, single_tool, agent_logs)
+        
+        tool_logs, results_by_tool = await asyncio.to_thread(_collect_tool_logs, all_logs, tool_names, log_lines)
+        analyses = await asyncio.gather(
+            *(_analyze_one(client, tool_name, logs) for tool_name, logs in tool_logs.items()),
+            return_exceptions=True
+        )
+        for tool_name, analysis in zip(tool_logs, analyses):
+            if isinstance(analysis, BaseException):
+                logger.error(f"Error analyzing tool {tool_name}: {analysis}")
+                analysis = {"error": str(analysis)}
+            results_by_tool[tool_name] = analysis
+        
+        if tool_filter:
+            return results_by_tool[tool_filter]
+        logger.info(f"Completed analysis for {len(results_by_tool)} tools: {list(results_by_tool.keys())}")
+        return results_by_tool
         
     except Exception as e:
         logger.error(f"Error analyzing backend logs: {e}", exc_info=True)
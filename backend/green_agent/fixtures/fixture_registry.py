@@ -1,12 +1,25 @@
 """Fixture registry for managing and loading fixtures."""
+import functools
 import json
 import os
 import hashlib
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, Optional, Tuple, Union
 from pathlib import Path
 import pandas as pd
 
 from ..models.fixture_models import FixtureResponse, FixtureMetadata
+from ..utils.records import dataframe_to_records
+
+
+@functools.lru_cache(maxsize=4096)
+def _hash_params_cached(tool_name: str, items: Tuple[Tuple[str, str], ...]) -> str:
+    """MD5 of normalized (key, value) pairs; repeated lookups skip the dumps and hash."""
+    normalized = {
+        "tool": tool_name,
+        **dict(items)
+    }
+    param_str = json.dumps(normalized, sort_keys=True)
+    return hashlib.md5(param_str.encode()).hexdigest()
 
 
 class FixtureRegistry:
@@ -27,22 +40,25 @@ class FixtureRegistry:
         
         self.fixtures_dir.mkdir(parents=True, exist_ok=True)
         self._cache: Dict[str, Any] = {}
+        self._path_cache: Dict[Tuple[str, int, Optional[str]], Path] = {}
     
     def _hash_params(self, tool_name: str, params: Dict[str, Any]) -> str:
         """Generate hash for tool params to match fixtures."""
         # Normalize params for consistent hashing
-        normalized = {
-            "tool": tool_name,
-            **{k: str(v).lower().strip() for k, v in sorted(params.items())}
-        }
-        param_str = json.dumps(normalized, sort_keys=True)
-        return hashlib.md5(param_str.encode()).hexdigest()
+        items = tuple((k, str(v).lower().strip()) for k, v in sorted(params.items()))
+        return _hash_params_cached(tool_name, items)
     
     def _get_fixture_path(self, tool_name: str, seed: int, param_hash: Optional[str] = None) -> Path:
         """Get path to fixture file."""
-        if param_hash:
-            return self.fixtures_dir / tool_name / f"{seed}_{param_hash}.json"
-        return self.fixtures_dir / tool_name / f"{seed}.json"
+        key = (tool_name, seed, param_hash or None)
+        path = self._path_cache.get(key)
+        if path is None:
+            if param_hash:
+                path = self.fixtures_dir / tool_name / f"{seed}_{param_hash}.json"
+            else:
+                path = self.fixtures_dir / tool_name / f"{seed}.json"
+            self._path_cache[key] = path
+        return path
     
     def load_fixture(
         self,
@@ -146,7 +162,7 @@ class FixtureRegistry:
         
         # Prepare data for JSON serialization
         if isinstance(data, pd.DataFrame):
-            serialized_data = {'records': data.to_dict('records')}
+            serialized_data = {'records': dataframe_to_records(data)}
         elif isinstance(data, dict):
             serialized_data = data
         else:
@@ -1,6 +1,8 @@
 """Integration with existing chatbot codebase."""
 from typing import Dict, Any, Optional, List, Tuple
+import functools
 import logging
+import re
 import time
 import hashlib
 
@@ -11,6 +13,26 @@ from .execution.trace_ledger import TraceLedgerManager
 
 logger = logging.getLogger(__name__)
 
+# Map city names to canonical airport codes (used by normalize_query)
+_CITY_TO_CODE = {
+    'los angeles': 'LAX', 'lax': 'LAX',
+    'new york': 'NYC', 'nyc': 'NYC', 'jfk': 'NYC', 'ewr': 'NYC', 'lga': 'NYC',
+    'san francisco': 'SFO', 'sfo': 'SFO',
+    'chicago': 'ORD', 'ord': 'ORD',
+    'miami': 'MIA', 'mia': 'MIA',
+    'barcelona': 'BCN', 'bcn': 'BCN',
+    'tokyo': 'NRT', 'nrt': 'NRT', 'hnd': 'NRT',
+}
+
+_AIRPORT_CODE_RE = re.compile(r'\b[A-Z]{3}\b')
+
+# Date formats found in queries, with how each is normalized
+_DATE_PATTERNS = (
+    (re.compile(r'\d{4}-\d{2}-\d{2}'), lambda m: m.group(0)),  # 2026-03-15
+    (re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})'), lambda m: f"{m.group(3)}-{m.group(1).zfill(2)}-{m.group(2).zfill(2)}"),  # 3/15/2026 -> 2026-03-15
+    (re.compile(r'(\w+)\s+(\d{1,2}),?\s+(\d{4})'), lambda m: m.group(3) + "-XX-XX"),  # March 15, 2026 -> 2026-XX-XX (partial match)
+)
+
 # Global tool call tracking per execution (reset for each new execution)
 _tool_call_counts: Dict[str, int] = {}
 _tool_failures: Dict[str, str] = {}  # Track permanent failures: tool_name -> error_message
@@ -26,37 +48,22 @@ def reset_tool_call_tracking():
     logger.info("[Integration] Tool call tracking reset for new execution")
 
 
+# Pure function of the query; each tool call normalizes the same query for the
+# duplicate check, its log line and record_tool_success, so compute it once
+@functools.lru_cache(maxsize=256)
 def normalize_query(query: str) -> str:
     """Normalize query to detect similar/duplicate calls."""
-    import re
-    
     # Remove extra whitespace, convert to lowercase, remove trailing newlines
     normalized = " ".join(query.lower().strip().split())
     original_upper = query.upper()  # Keep original for airport code extraction
     
-    # Map city names to canonical airport codes
-    city_to_code = {
-        'los angeles': 'LAX', 'lax': 'LAX',
-        'new york': 'NYC', 'nyc': 'NYC', 'jfk': 'NYC', 'ewr': 'NYC', 'lga': 'NYC',
-        'san francisco': 'SFO', 'sfo': 'SFO',
-        'chicago': 'ORD', 'ord': 'ORD',
-        'miami': 'MIA', 'mia': 'MIA',
-        'barcelona': 'BCN', 'bcn': 'BCN',
-        'tokyo': 'NRT', 'nrt': 'NRT', 'hnd': 'NRT',
-    }
-    
     # Extract airport codes (3 uppercase letters)
-    airport_codes = re.findall(r'\b[A-Z]{3}\b', original_upper)
+    airport_codes = _AIRPORT_CODE_RE.findall(original_upper)
     
     # Extract dates (multiple formats)
-    date_patterns = [
-        (r'\d{4}-\d{2}-\d{2}', lambda m: m.group(0)),  # 2026-03-15
-        (r'(\d{1,2})/(\d{1,2})/(\d{4})', lambda m: f"{m.group(3)}-{m.group(1).zfill(2)}-{m.group(2).zfill(2)}"),  # 3/15/2026 -> 2026-03-15
-        (r'(\w+)\s+(\d{1,2}),?\s+(\d{4})', lambda m: m.group(3) + "-XX-XX"),  # March 15, 2026 -> 2026-XX-XX (partial match)
-    ]
     dates = []
-    for pattern, formatter in date_patterns:
-        for match in re.finditer(pattern, normalized):
+    for pattern, formatter in _DATE_PATTERNS:
+        for match in pattern.finditer(normalized):
             dates.append(formatter(match))
     
     # For flight queries, build a signature from route and dates
@@ -68,7 +75,7 @@ def normalize_query(query: str) -> str:
         found_codes = []
         
         # Check for city names first (before airport codes)
-        for city, code in city_to_code.items():
+        for city, code in _CITY_TO_CODE.items():
             if city in normalized_lower:
                 found_codes.append(code)
                 # Remove the city name to avoid double matching
@@ -216,7 +223,7 @@ def wrap_white_agent_tools(
             white_agent_instance.agent_executor = AgentExecutor(
                 agent=original_agent,
                 tools=original_tools,
-                verbose=True,
+                verbose=False,  # WhiteAgent logs the ReAct trace via its AgentTraceLogHandler
                 max_iterations=8,  # Reduced from 15 to prevent excessive retries (allows 2 per tool across 4 tools)
                 max_execution_time=300,
                 handle_parsing_errors=True,
@@ -297,11 +304,11 @@ def wrap_white_agent_tools(
                             logger.info(f"[Integration] Calling wrapped function for {t_name}")
                             result = wrapped_func(query)
                             
-                            # Get raw DataFrame/JSON data from fixture wrapper (stored in _last_fixture_data)
+                            # Get raw DataFrame/JSON data from fixture wrapper; it is kept per thread,
+                            # so parallel ItineraryTool legs each read their own call's data
                             raw_data = None
                             if fixture_wrapper_ref:
-                                # fixture_wrapper_ref IS the FixtureWrapper instance, access _last_fixture_data directly
-                                last_fixture = getattr(fixture_wrapper_ref, '_last_fixture_data', None)
+                                last_fixture = fixture_wrapper_ref.last_fixture_data
                                 if last_fixture is not None:
                                     raw_data = last_fixture
                                     logger.info(f"[Integration] Retrieved raw data from fixture wrapper: {type(raw_data).__name__}")
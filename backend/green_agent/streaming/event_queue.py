@@ -7,6 +7,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# High-volume event types logged at DEBUG so they don't flood backend.log
+_QUIET_EVENT_TYPES = frozenset({'white_agent_token'})
+
 
 class EventQueue:
     """Thread-safe queue for events from sync contexts."""
@@ -56,14 +59,16 @@ class EventQueue:
                             await asyncio.sleep(0.1)
                             continue
                         
-                        # Send to all subscribers
-                        logger.info(f"[EventQueue] Processing event: {event.get('type', 'unknown')}, subscribers: {len(self._subscribers)}")
+                        # Send to all subscribers; token events are too frequent for INFO
+                        event_type = event.get('type', 'unknown')
+                        log_level = logging.DEBUG if event_type in _QUIET_EVENT_TYPES else logging.INFO
+                        logger.log(log_level, f"[EventQueue] Processing event: {event_type}, subscribers: {len(self._subscribers)}")
                         disconnected_subscribers = []
                         for callback in self._subscribers.copy():  # Copy to avoid modification during iteration
                             try:
-                                logger.info(f"[EventQueue] Sending event to subscriber")
+                                logger.log(log_level, f"[EventQueue] Sending event to subscriber")
                                 await callback(event)
-                                logger.info(f"[EventQueue] Event sent successfully")
+                                logger.log(log_level, f"[EventQueue] Event sent successfully")
                             except Exception as e:
                                 error_str = str(e)
                                 # Check if it's a connection/disconnect error
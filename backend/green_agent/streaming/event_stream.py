@@ -4,6 +4,8 @@ from typing import Dict, Any, Optional, Callable, List
 from datetime import datetime
 import json
 
+from ..utils.records import dataframe_to_records
+
 
 class EventStream:
     """Manages streaming events for tool calls and fixture responses."""
@@ -67,7 +69,7 @@ class EventStream:
         # Serialize fixture data
         if hasattr(fixture_data, 'to_dict'):
             # DataFrame
-            serialized_data = fixture_data.to_dict('records')
+            serialized_data = dataframe_to_records(fixture_data)
         elif isinstance(fixture_data, dict):
             serialized_data = fixture_data
         elif isinstance(fixture_data, str):
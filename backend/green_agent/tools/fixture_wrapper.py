@@ -1,6 +1,7 @@
 """Wrapper to intercept tool calls and return fixtures instead of API calls."""
 from typing import Dict, Any, Optional, Callable
 import logging
+import threading
 from datetime import datetime
 
 from ..fixtures.fixture_registry import FixtureRegistry
@@ -11,6 +12,7 @@ from ..infrastructure.controller import GreenAgentController
 from ..models.fixture_models import FixtureResponse
 from ..streaming.event_stream import get_event_stream
 from ..streaming.event_queue import get_event_queue
+from ..utils.records import dataframe_to_records
 
 logger = logging.getLogger(__name__)
 
@@ -23,8 +25,12 @@ class FixtureWrapper:
         controller: GreenAgentController,
         registry: Optional[FixtureRegistry] = None
     ):
-        # Store last fixture data for access
-        self._last_fixture_data = None
+        # Raw data of the last call made on each thread; ItineraryTool runs legs
+        # in parallel, so a shared slot would hand one leg another leg's data
+        self._local = threading.local()
+        # (raw data, to_dict('records')) of the last DataFrame fixture served, replaced
+        # as one tuple so readers never see one call's data with another's records
+        self._last_served: tuple = (None, None)
         """
         Initialize fixture wrapper.
         
@@ -114,6 +120,9 @@ class FixtureWrapper:
                     scenario_id=scenario_id
                 )
                 
+                # Serialize DataFrame fixtures once; reused by the event below and by callers
+                records = dataframe_to_records(fixture_data) if hasattr(fixture_data, 'to_dict') else None
+                
                 if fixture_response:
                     fixture_metadata = fixture_response.metadata
                     
@@ -122,9 +131,9 @@ class FixtureWrapper:
                     try:
                         # Serialize fixture data for JSON
                         serialized_data = fixture_data
-                        if hasattr(fixture_data, 'to_dict'):
+                        if records is not None:
                             # DataFrame
-                            serialized_data = fixture_data.to_dict('records')
+                            serialized_data = records
                             logger.info(f"[FixtureWrapper] Serialized DataFrame to {len(serialized_data)} records")
                         elif isinstance(fixture_data, dict):
                             serialized_data = fixture_data
@@ -151,7 +160,8 @@ class FixtureWrapper:
                         logger.error(f"[FixtureWrapper] Failed to queue fixture response event: {e}", exc_info=True)
                 
                 # Store raw fixture data for later access (before any conversions)
-                self._last_fixture_data = fixture_data
+                self._local.fixture_data = fixture_data
+                self._last_served = (fixture_data, records)
                 
                 # Log intercepted call
                 intercepted = {
@@ -168,10 +178,10 @@ class FixtureWrapper:
                 logger.info(f"Intercepted {tool_name} call, returning fixture (seed={seed}). Raw data type: {type(fixture_data).__name__}")
                 
                 # Return fixture data in format expected by tool
-                # Tools need to return strings for AgentExecutor, but we've stored raw data in _last_fixture_data
+                # Tools need to return strings for AgentExecutor, but we've stored raw data in last_fixture_data
                 if fixture_response and fixture_response.format == 'dataframe':
                     # For DataFrames, we need to return a string but store the DataFrame
-                    # The raw DataFrame is stored in _last_fixture_data and intercepted_calls
+                    # The raw DataFrame is stored in last_fixture_data and intercepted_calls
                     if hasattr(fixture_data, 'to_json'):
                         # Convert DataFrame to JSON string for AgentExecutor
                         return fixture_data.to_json(orient='records', date_format='iso')
@@ -188,18 +198,35 @@ class FixtureWrapper:
                         return json.dumps(fixture_data, indent=2)
                     return fixture_data
                 else:
-                    # Fallback: return as string but raw data is stored in _last_fixture_data
+                    # Fallback: return as string but raw data is stored in last_fixture_data
                     return str(fixture_data) if not isinstance(fixture_data, str) else fixture_data
             
             # No fixture found - fall back to original tool (or return error)
             logger.warning(f"No fixture found for {tool_name}, falling back to original tool")
             result = original_tool(*args, **kwargs)
             # Store the result as last fixture data even if it's from original tool
-            self._last_fixture_data = result
+            self._local.fixture_data = result
             return result
         
         return wrapped_tool
     
+    @property
+    def last_fixture_data(self) -> Any:
+        """Raw data returned by the last wrapped call made on the current thread."""
+        return getattr(self._local, 'fixture_data', None)
+    
+    @property
+    def last_records(self) -> Optional[list]:
+        """Cached to_dict('records') of the last DataFrame fixture, if any."""
+        return self._last_served[1]
+    
+    def records_for(self, data: Any) -> Optional[list]:
+        """Return cached records when data is the last fixture DataFrame served."""
+        last_data, last_records = self._last_served
+        if data is not None and data is last_data:
+            return last_records
+        return None
+    
     def get_intercepted_calls(self) -> list[Dict[str, Any]]:
         """Get list of all intercepted tool calls."""
         return self.intercepted_calls.copy()
@@ -1,5 +1,6 @@
 """Utility functions for Green Agent."""
 from .df_parser import extract_df_operations
+from .json_extract import extract_json_object
+from .records import dataframe_to_records
 
-__all__ = ['extract_df_operations']
-
+__all__ = ['extract_df_operations', 'extract_json_object', 'dataframe_to_records']
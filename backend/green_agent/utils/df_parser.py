@@ -3,6 +3,88 @@ import re
 from typing import List, Dict, Any, Optional
 
 
+# Common DataFrame operation patterns
+_OPERATION_PATTERNS = {
+    'shape': r'\.shape\b',
+    'columns': r'\.columns(?:\.tolist\(\))?',
+    'info': r'\.info\(\)',
+    'describe': r'\.describe\(\)',
+    'head': r'\.head\([^)]*\)',
+    'tail': r'\.tail\([^)]*\)',
+    'copy': r'\.copy\([^)]*\)',
+    'sort_values': r'\.sort_values\([^)]+\)',
+    'sort_index': r'\.sort_index\([^)]*\)',
+    'filter': r'\.filter\([^)]+\)',
+    'loc': r'\.loc\[[^\]]+\]',
+    'iloc': r'\.iloc\[[^\]]+\]',
+    'query': r'\.query\([^)]+\)',
+    'groupby': r'\.groupby\([^)]+\)',
+    'agg': r'\.agg\([^)]+\)',
+    'aggregate': r'\.aggregate\([^)]+\)',
+    'sum': r'\.sum\([^)]*\)',
+    'mean': r'\.mean\([^)]*\)',
+    'max': r'\.max\([^)]*\)',
+    'min': r'\.min\([^)]*\)',
+    'count': r'\.count\([^)]*\)',
+    'nunique': r'\.nunique\([^)]*\)',
+    'unique': r'\.unique\([^)]*\)',
+    'drop': r'\.drop\([^)]+\)',
+    'dropna': r'\.dropna\([^)]*\)',
+    'fillna': r'\.fillna\([^)]+\)',
+    'rename': r'\.rename\([^)]+\)',
+    'merge': r'\.merge\([^)]+\)',
+    'join': r'\.join\([^)]+\)',
+    'concat': r'(?:pd\.|pandas\.)?concat\([^)]+\)',
+    'iterrows': r'\.iterrows\(\)',
+    'itertuples': r'\.itertuples\([^)]*\)',
+    'to_string': r'\.to_string\([^)]*\)',
+    'to_dict': r'\.to_dict\([^)]*\)',
+    'to_json': r'\.to_json\([^)]*\)',
+    'isna': r'\.isna\(\)',
+    'isnull': r'\.isnull\(\)',
+    'notna': r'\.notna\(\)',
+    'notnull': r'\.notnull\(\)',
+    'astype': r'\.astype\([^)]+\)',
+    'select_dtypes': r'\.select_dtypes\([^)]+\)',
+    'str.contains': r'\.str\.contains\([^)]+\)',
+}
+
+# Boolean operations
+_BOOLEAN_PATTERNS = [
+    r'\[[^\]]*==[^\]]*\]',  # Boolean indexing with ==
+    r'\[[^\]]*!=[^\]]*\]',  # Boolean indexing with !=
+    r'\[[^\]]*>[^\]]*\]',   # Boolean indexing with >
+    r'\[[^\]]*<[^\]]*\]',   # Boolean indexing with <
+    r'\[[^\]]*>=[^\]]*\]',  # Boolean indexing with >=
+    r'\[[^\]]*<=[^\]]*\]',  # Boolean indexing with <=
+    r'\[[^\]]*&[^\]]*\]',   # Boolean indexing with &
+    r'\[[^\]]*\|[^\]]*\]',  # Boolean indexing with |
+]
+
+# DataFrame variable names (df, df_, df_name, flightDF, ...), matched case-insensitively.
+# Every pattern below is compiled once with the variable captured in group 1, instead of
+# re-escaping and re-compiling each pattern per variable on every call.
+_DF_VAR = r'(?i:df(?:_\w+)?|\w*df\w*)'
+_COMPILED_OPERATIONS = [
+    (op_name, re.compile(rf'\b({_DF_VAR})\.{pattern}', re.MULTILINE))
+    for op_name, pattern in _OPERATION_PATTERNS.items()
+]
+_COMPILED_BOOLEAN = [re.compile(rf'\b({_DF_VAR}){pattern}', re.MULTILINE) for pattern in _BOOLEAN_PATTERNS]
+_ASSIGNMENT_RE = re.compile(r'(\w+)\s*=\s*(?:df(?:_\w+)?|\w*df\w*)\.(\w+)\(', re.IGNORECASE)
+
+# Common false positives for the variable pattern
+_IGNORED_VARS = frozenset({'describe', 'filter'})
+
+
+def _line_at(code: str, match) -> str:
+    """The full source line containing a match."""
+    line_start = code.rfind('\n', 0, match.start()) + 1
+    line_end = code.find('\n', match.end())
+    if line_end == -1:
+        line_end = len(code)
+    return code[line_start:line_end].strip()
+
+
 def extract_df_operations(code: str) -> List[Dict[str, Any]]:
     """
     Extract DataFrame operations from Python code.
@@ -18,138 +100,41 @@ def extract_df_operations(code: str) -> List[Dict[str, Any]]:
     if not code or not isinstance(code, str):
         return operations
     
-    # Common DataFrame operation patterns
-    patterns = {
-        'shape': r'\.shape\b',
-        'columns': r'\.columns(?:\.tolist\(\))?',
-        'info': r'\.info\(\)',
-        'describe': r'\.describe\(\)',
-        'head': r'\.head\([^)]*\)',
-        'tail': r'\.tail\([^)]*\)',
-        'copy': r'\.copy\([^)]*\)',
-        'sort_values': r'\.sort_values\([^)]+\)',
-        'sort_index': r'\.sort_index\([^)]*\)',
-        'filter': r'\.filter\([^)]+\)',
-        'loc': r'\.loc\[[^\]]+\]',
-        'iloc': r'\.iloc\[[^\]]+\]',
-        'query': r'\.query\([^)]+\)',
-        'groupby': r'\.groupby\([^)]+\)',
-        'agg': r'\.agg\([^)]+\)',
-        'aggregate': r'\.aggregate\([^)]+\)',
-        'sum': r'\.sum\([^)]*\)',
-        'mean': r'\.mean\([^)]*\)',
-        'max': r'\.max\([^)]*\)',
-        'min': r'\.min\([^)]*\)',
-        'count': r'\.count\([^)]*\)',
-        'nunique': r'\.nunique\([^)]*\)',
-        'unique': r'\.unique\([^)]*\)',
-        'drop': r'\.drop\([^)]+\)',
-        'dropna': r'\.dropna\([^)]*\)',
-        'fillna': r'\.fillna\([^)]+\)',
-        'rename': r'\.rename\([^)]+\)',
-        'merge': r'\.merge\([^)]+\)',
-        'join': r'\.join\([^)]+\)',
-        'concat': r'(?:pd\.|pandas\.)?concat\([^)]+\)',
-        'iterrows': r'\.iterrows\(\)',
-        'itertuples': r'\.itertuples\([^)]*\)',
-        'to_string': r'\.to_string\([^)]*\)',
-        'to_dict': r'\.to_dict\([^)]*\)',
-        'to_json': r'\.to_json\([^)]*\)',
-        'isna': r'\.isna\(\)',
-        'isnull': r'\.isnull\(\)',
-        'notna': r'\.notna\(\)',
-        'notnull': r'\.notnull\(\)',
-        'astype': r'\.astype\([^)]+\)',
-        'select_dtypes': r'\.select_dtypes\([^)]+\)',
-        'str.contains': r'\.str\.contains\([^)]+\)',
-    }
+    # Check for each operation pattern (df.operation or df_name.operation)
+    for op_name, regex in _COMPILED_OPERATIONS:
+        for match in regex.finditer(code):
+            df_var = match.group(1)
+            if len(df_var) < 2 or df_var in _IGNORED_VARS:  # Skip single character matches
+                continue
+            operations.append({
+                'dataframe': df_var,
+                'operation': op_name,
+                'full_expression': _line_at(code, match),
+                'position': match.start()
+            })
     
-    # Boolean operations
-    boolean_patterns = [
-        r'\[[^\]]*==[^\]]*\]',  # Boolean indexing with ==
-        r'\[[^\]]*!=[^\]]*\]',  # Boolean indexing with !=
-        r'\[[^\]]*>[^\]]*\]',   # Boolean indexing with >
-        r'\[[^\]]*<[^\]]*\]',   # Boolean indexing with <
-        r'\[[^\]]*>=[^\]]*\]',  # Boolean indexing with >=
-        r'\[[^\]]*<=[^\]]*\]',  # Boolean indexing with <=
-        r'\[[^\]]*&[^\]]*\]',   # Boolean indexing with &
-        r'\[[^\]]*\|[^\]]*\]',  # Boolean indexing with |
-    ]
-    
-    # Find DataFrame variable names (common patterns: df, df_, df_name, etc.)
-    df_var_pattern = r'\b(df(?:_\w+)?|\w*df\w*)\b'
-    df_vars = set(re.findall(df_var_pattern, code, re.IGNORECASE))
-    
-    # Remove common false positives
-    df_vars.discard('describe')
-    df_vars.discard('filter')
-    
-    # Track operations per DataFrame variable
-    for df_var in df_vars:
-        if len(df_var) < 2:  # Skip single character matches
-            continue
-            
-        # Check for each operation pattern
-        for op_name, pattern in patterns.items():
-            # Look for patterns like df.operation or df_name.operation
-            full_pattern = rf'\b{re.escape(df_var)}\.{pattern}'
-            matches = re.finditer(full_pattern, code, re.MULTILINE)
-            
-            for match in matches:
-                # Extract the full operation line
-                line_start = code.rfind('\n', 0, match.start()) + 1
-                line_end = code.find('\n', match.end())
-                if line_end == -1:
-                    line_end = len(code)
-                
-                operation_line = code[line_start:line_end].strip()
-                
-                operations.append({
-                    'dataframe': df_var,
-                    'operation': op_name,
-                    'full_expression': operation_line,
-                    'position': match.start()
-                })
-        
-        # Check for boolean indexing
-        for bool_pattern in boolean_patterns:
-            full_pattern = rf'\b{re.escape(df_var)}{bool_pattern}'
-            matches = re.finditer(full_pattern, code, re.MULTILINE)
-            
-            for match in matches:
-                line_start = code.rfind('\n', 0, match.start()) + 1
-                line_end = code.find('\n', match.end())
-                if line_end == -1:
-                    line_end = len(code)
-                
-                operation_line = code[line_start:line_end].strip()
-                
-                operations.append({
-                    'dataframe': df_var,
-                    'operation': 'boolean_indexing',
-                    'full_expression': operation_line,
-                    'position': match.start()
-                })
+    # Check for boolean indexing
+    for regex in _COMPILED_BOOLEAN:
+        for match in regex.finditer(code):
+            df_var = match.group(1)
+            if len(df_var) < 2 or df_var in _IGNORED_VARS:
+                continue
+            operations.append({
+                'dataframe': df_var,
+                'operation': 'boolean_indexing',
+                'full_expression': _line_at(code, match),
+                'position': match.start()
+            })
     
     # Also check for assignments (e.g., df_analysis = df.copy())
-    assignment_pattern = r'(\w+)\s*=\s*(?:df(?:_\w+)?|\w*df\w*)\.(\w+)\('
-    assignments = re.finditer(assignment_pattern, code, re.IGNORECASE)
-    
-    for match in assignments:
+    for match in _ASSIGNMENT_RE.finditer(code):
         new_var = match.group(1)
         op_name = match.group(2)
         
-        line_start = code.rfind('\n', 0, match.start()) + 1
-        line_end = code.find('\n', match.end())
-        if line_end == -1:
-            line_end = len(code)
-        
-        operation_line = code[line_start:line_end].strip()
-        
         operations.append({
             'dataframe': 'assignment',
             'operation': f'{new_var} = ...{op_name}()',
-            'full_expression': operation_line,
+            'full_expression': _line_at(code, match),
             'position': match.start()
         })
     
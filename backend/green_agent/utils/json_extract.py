@@ -0,0 +1,64 @@
+"""Utility to recover a JSON object from free-form LLM text."""
+from typing import Any, Dict, Optional
+
+try:
+    from orjson import loads as _loads, JSONDecodeError
+except ImportError:
+    from json import loads as _loads, JSONDecodeError
+
+
+def extract_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Extract the first complete JSON object from text.
+
+    Tries a direct parse first, then scans once for the first balanced
+    {...} span, skipping braces inside JSON strings.
+
+    Args:
+        text: LLM output that contains (or is) a JSON object
+
+    Returns:
+        Parsed object, or None if no valid object is found
+    """
+    if not text or not isinstance(text, str):
+        return None
+
+    stripped = text.strip()
+    if stripped.startswith('{'):
+        try:
+            parsed = _loads(stripped)
+            if isinstance(parsed, dict):
+                return parsed
+        except JSONDecodeError:
+            pass
+
+    start = text.find('{')
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                try:
+                    parsed = _loads(text[start:i + 1])
+                except JSONDecodeError:
+                    return None
+                return parsed if isinstance(parsed, dict) else None
+
+    return None
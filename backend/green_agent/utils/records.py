@@ -0,0 +1,39 @@
+"""Utility to turn DataFrames into JSON-ready record lists."""
+from typing import Any, Dict, List
+
+import numpy as np
+
+# numpy dtype kinds whose ndarray.tolist() matches to_dict('records') values
+# (bool, int, uint, float, object); datetimes would come back as raw ints
+_BLOCK_KINDS = frozenset("biufO")
+
+
+def dataframe_to_records(df) -> List[Dict[str, Any]]:
+    """
+    Equivalent of df.to_dict('records'), built column-wise.
+
+    to_dict('records') boxes every cell through pandas' per-value
+    maybe_box_native. A frame with one plain numpy dtype is converted with a
+    single to_numpy().tolist() call; mixed-dtype frames (flight fixtures:
+    prices, airlines, times) convert each column once with Series.tolist()
+    and zip the rows, like itertuples(index=False, name=None) does.
+
+    Args:
+        df: pandas DataFrame
+
+    Returns:
+        List of {column: value} dicts, one per row
+    """
+    columns = list(df.columns)
+    if df.columns.has_duplicates:
+        # Column lookup by label is ambiguous; keep pandas' own behaviour
+        return df.to_dict('records')
+
+    dtypes = set(df.dtypes)
+    if len(dtypes) == 1:
+        dtype = dtypes.pop()
+        if isinstance(dtype, np.dtype) and dtype.kind in _BLOCK_KINDS:
+            return [dict(zip(columns, row)) for row in df.to_numpy().tolist()]
+
+    values = [df.iloc[:, i].tolist() for i in range(len(columns))]
+    return [dict(zip(columns, row)) for row in zip(*values)]
@@ -3,6 +3,19 @@ import re
 from typing import Any, Dict, List
 from datetime import datetime
 
+# Compiled once; normalize_value runs these on every string in a plan
+_ARROW_RE = re.compile(r'[→⇒]')
+_MD_LINK_RE = re.compile(r'\[([^\]]+)\]\([^\)]+\)')
+_MD_EMPHASIS_RE = re.compile(r'[*_]{1,2}([^*_]+)[*_]{1,2}')
+_ISO_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+_MONTH_DAY_RE = re.compile(r'([a-z]+)\s+(\d+)')
+
+_MONTH_NAMES = {
+    'jan': '01', 'feb': '02', 'mar': '03', 'apr': '04',
+    'may': '05', 'jun': '06', 'jul': '07', 'aug': '08',
+    'sep': '09', 'oct': '10', 'nov': '11', 'dec': '12'
+}
+
 
 class PlanNormalizer:
     """Normalizes tool plans with safe transformations."""
@@ -17,13 +30,13 @@ class PlanNormalizer:
         s = s.strip()
         
         # Normalize arrows
-        s = re.sub(r'[→⇒]', '>', s)
+        s = _ARROW_RE.sub('>', s)
         
         # Remove stray markdown (but preserve structure)
         # Remove markdown links but keep text
-        s = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', s)
+        s = _MD_LINK_RE.sub(r'\1', s)
         # Remove markdown bold/italic markers but keep text
-        s = re.sub(r'[*_]{1,2}([^*_]+)[*_]{1,2}', r'\1', s)
+        s = _MD_EMPHASIS_RE.sub(r'\1', s)
         
         return s
     
@@ -43,7 +56,7 @@ class PlanNormalizer:
         date_str = date_str.strip()
         
         # Already in YYYY-MM-DD format
-        if re.match(r'^\d{4}-\d{2}-\d{2}$', date_str):
+        if _ISO_DATE_RE.match(date_str):
             return date_str
         
         # Try to parse common formats
@@ -56,17 +69,11 @@ class PlanNormalizer:
                     return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
             
             # Month name format (e.g., "Dec 2", "December 2")
-            month_names = {
-                'jan': '01', 'feb': '02', 'mar': '03', 'apr': '04',
-                'may': '05', 'jun': '06', 'jul': '07', 'aug': '08',
-                'sep': '09', 'oct': '10', 'nov': '11', 'dec': '12'
-            }
-            
             # Try to match "Month Day" or "Mon Day"
-            match = re.match(r'([a-z]+)\s+(\d+)', date_str.lower())
+            match = _MONTH_DAY_RE.match(date_str.lower())
             if match:
                 month_name, day = match.groups()
-                month = month_names.get(month_name[:3])
+                month = _MONTH_NAMES.get(month_name[:3])
                 if month:
                     # Assume current year (or you could make this configurable)
                     year = datetime.now().year
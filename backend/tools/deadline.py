@@ -0,0 +1,28 @@
+"""Per-call deadline shared by the search tools' HTTP and LLM requests."""
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+# Absolute time.monotonic() by which the current tool call must finish. Set per leg by
+# ItineraryTool, so a timed-out leg's requests give up instead of holding a worker.
+CALL_DEADLINE: ContextVar[Optional[float]] = ContextVar("tool_call_deadline", default=None)
+
+# Anthropic SDK's own default request timeout; used when no deadline is set
+LLM_TIMEOUT_SECONDS = 600.0
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current call's deadline, or None when there is none."""
+    deadline = CALL_DEADLINE.get()
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Tool call deadline exceeded")
+    return remaining
+
+
+def timeout_for(default: float) -> float:
+    """Request timeout: default, capped to the time left before the call's deadline."""
+    remaining = remaining_time()
+    return default if remaining is None else min(default, remaining)
@@ -4,8 +4,10 @@ import os
 import anthropic
 from jsonschema import validate, ValidationError
 import requests
+import threading
 import time
 import requests
+from collections import OrderedDict
 import pandas as pd
 from langchain_core.runnables import RunnableLambda, RunnableSequence
 import dotenv
@@ -14,6 +16,8 @@ from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe
 from langchain_anthropic import ChatAnthropic
 import logging
 
+from tools.deadline import LLM_TIMEOUT_SECONDS, remaining_time, timeout_for
+
 logger = logging.getLogger(__name__)
 
 dotenv.load_dotenv()
@@ -34,6 +38,46 @@ with open(os.path.join(functions_dir, "serp_params_round_trip.json"), "r") as f:
     serp_params_round_trip = json.load(f)
 
 
+# Processed flight DataFrames keyed by the extracted SerpAPI params. A follow-up
+# question about the same search ("which of these is cheapest?") is a different
+# prompt, but it can be answered from the same flights without re-running the
+# outbound + per-outbound return fetches.
+FLIGHT_DF_CACHE_TTL_SECONDS = 900
+FLIGHT_DF_CACHE_MAXSIZE = 32
+_flight_df_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_flight_df_cache_lock = threading.Lock()
+
+
+def _flight_params_key(params: dict) -> tuple:
+    """Cache key for a flight search: the params that select flights (no api_key/token)."""
+    return tuple(sorted(
+        (k, str(v)) for k, v in params.items() if k not in ("api_key", "departure_token")
+    ))
+
+
+def _get_cached_flights(key: tuple):
+    """Return a copy of the cached DataFrame for key, or None if missing or expired."""
+    with _flight_df_cache_lock:
+        hit = _flight_df_cache.get(key)
+        if hit is None:
+            return None
+        if time.monotonic() - hit[0] >= FLIGHT_DF_CACHE_TTL_SECONDS:
+            del _flight_df_cache[key]
+            return None
+        _flight_df_cache.move_to_end(key)
+        df = hit[1]
+    # The pandas agent runs arbitrary code against its DataFrame; never hand it the cached one
+    return df.copy()
+
+
+def _store_cached_flights(key: tuple, df) -> None:
+    with _flight_df_cache_lock:
+        _flight_df_cache[key] = (time.monotonic(), df)
+        _flight_df_cache.move_to_end(key)
+        while len(_flight_df_cache) > FLIGHT_DF_CACHE_MAXSIZE:
+            _flight_df_cache.popitem(last=False)
+
+
 # ============================================================================
 # Airport Code Normalization
 # ============================================================================
@@ -214,10 +258,15 @@ def transform_df(df, is_one_way=False):
 
     # enforce pairing rule: same outbound_idx AND same airline AND same price
     # if multiple returns satisfy this, pick earliest return depart; tie-break shorter duration
-    ret_sorted = ret.sort_values(["outbound_idx", "airline", "price_ret", "depart_time_ret", "duration_min_ret"])
+    # drop_duplicates on the sorted frame keeps each group's first row in one hashed pass,
+    # instead of groupby().first() reducing every column per group (and possibly mixing
+    # non-null values from different rows). Null keys are dropped as groupby did.
+    pair_keys = ["outbound_idx", "airline", "price_ret"]
+    ret_sorted = ret.sort_values(pair_keys + ["depart_time_ret", "duration_min_ret"])
     best_ret = (
-        ret_sorted.groupby(["outbound_idx", "airline", "price_ret"], as_index=False)
-                .first()
+        ret_sorted.dropna(subset=pair_keys)
+                .drop_duplicates(subset=pair_keys, keep="first")
+                .reset_index(drop=True)
     )
 
     # join outbound to best matching return
@@ -321,7 +370,7 @@ def data_to_df(data, params):
             params["departure_token"] = token
             params["api_key"] = serp_api_key
             
-            r = requests.get(BASE_URL, params=params, timeout=30)
+            r = requests.get(BASE_URL, params=params, timeout=timeout_for(30))
             if r.status_code != 200:
                 print(f"⚠️ Failed return fetch for outbound #{i} ({r.status_code})")
                 continue
@@ -361,6 +410,7 @@ def anthropic_IATA_call(iata_result: str):
     
     response = client.messages.create(
         model="claude-sonnet-4-5",
+        timeout=timeout_for(LLM_TIMEOUT_SECONDS),
         system=(
             "Return the IATA AIRPORT codes (not city codes) for the city provided by the user. "
             "CRITICAL: Return valid airport codes, not city codes. "
@@ -423,6 +473,7 @@ def get_flight_api_params(iata_result: dict):
 
     response = client.messages.create(
         model="claude-sonnet-4-5",
+        timeout=timeout_for(LLM_TIMEOUT_SECONDS),
         max_tokens=1024,
         system=system_prompt,
         tools=[
@@ -498,6 +549,7 @@ def get_flight_api_params_direct(user_prompt: str):
     try:
         response = client.messages.create(
             model="claude-sonnet-4-5",
+            timeout=timeout_for(LLM_TIMEOUT_SECONDS),
             system=system_prompt,
             tools=[
                 {
@@ -558,10 +610,17 @@ def flight_tool(user_prompt: str):
         logger.error(f"Flight params extraction error: {e}", exc_info=True)
         return f"PERMANENT_FAILURE: {error_msg} Cannot proceed with flight search."
 
+    # data_to_df adds departure_token to params, so key the search before fetching
+    cache_key = _flight_params_key(params)
+    cached_df = _get_cached_flights(cache_key)
+    if cached_df is not None:
+        logger.info(f"Reusing cached flights for params: {dict(cache_key)}")
+        return chat_node(cached_df, user_prompt)
+
     url = "https://serpapi.com/search"
     
     try:
-        response = requests.get(url, params=params, timeout=30)
+        response = requests.get(url, params=params, timeout=timeout_for(30))
         response.raise_for_status()  # Raises HTTPError for bad status codes
         
     except requests.exceptions.HTTPError as e:
@@ -620,8 +679,10 @@ def flight_tool(user_prompt: str):
 
     # Process flight data
     try:
-        df = data_to_df(data, params)
-        return chat_node(sanitize_for_pandasai(df), user_prompt)
+        df = sanitize_for_pandasai(data_to_df(data, params))
+        _store_cached_flights(cache_key, df.copy())
+        logger.info(f"Fetched {len(df)} flight options ({len(df.columns)} columns)")
+        return chat_node(df, user_prompt)
     except (KeyError, ValueError) as e:
         # Handle missing columns/data structure issues
         error_msg = (
@@ -640,10 +701,11 @@ def flight_tool(user_prompt: str):
 
 def chat_node(df, prompt):
     agent = create_pandas_dataframe_agent(
-        llm=ChatAnthropic(model="claude-sonnet-4-5"),
+        llm=ChatAnthropic(model="claude-sonnet-4-5", timeout=timeout_for(LLM_TIMEOUT_SECONDS)),
         df=df,
         verbose=True,
         allow_dangerous_code=True,
+        max_execution_time=remaining_time(),
     )
 
     response = agent.invoke(prompt)['output']
@@ -651,7 +713,8 @@ def chat_node(df, prompt):
 
 
     def to_json(df):
-        return json.loads(df.to_json(orient="records"))
+        # to_json already produces the message text; json.loads + json.dumps re-walked every record
+        return df.to_json(orient="records", date_format="iso")
 
 
     client = anthropic.Anthropic(api_key=anthropic_api_key)
@@ -670,8 +733,9 @@ def chat_node(df, prompt):
     if type(response) != str:
         response = client.messages.create(
             model="claude-sonnet-4-5",
+            timeout=timeout_for(LLM_TIMEOUT_SECONDS),
             system=system_prompt,
-            messages=[{"role": "assistant", "content": json.dumps(to_json(response))}],
+            messages=[{"role": "assistant", "content": to_json(response)}],
             max_tokens=1024
         )
         return response.content[0].text
@@ -11,6 +11,8 @@ from langchain_experimental.agents.agent_toolkits import create_pandas_dataframe
 from langchain_anthropic import ChatAnthropic
 import logging
 
+from tools.deadline import LLM_TIMEOUT_SECONDS, remaining_time, timeout_for
+
 logger = logging.getLogger(__name__)
 
 dotenv.load_dotenv()
@@ -113,6 +115,7 @@ def get_hotel_api_params(user_prompt: str):
 
     response = client.messages.create(
         model="claude-sonnet-4-5",
+        timeout=timeout_for(LLM_TIMEOUT_SECONDS),
         system="Return the hotel api params for the hotel search.",
         tools=[{
             "name": "get_hotel_api_params",
@@ -148,7 +151,7 @@ def hotel_tool(user_prompt: str):
         logger.info(f"Making hotel search request with params: {params}")
         
         # Make API request
-        response = requests.get(url, params=params, timeout=30)
+        response = requests.get(url, params=params, timeout=timeout_for(30))
         response.raise_for_status()  # Raises HTTPError for bad status codes
         
     except requests.exceptions.HTTPError as e:
@@ -232,10 +235,11 @@ def chat_node(df, prompt):
     import time
     
     agent = create_pandas_dataframe_agent(
-        llm=ChatAnthropic(model="claude-sonnet-4-5", api_key=anthropic_api_key),
+        llm=ChatAnthropic(model="claude-sonnet-4-5", api_key=anthropic_api_key, timeout=timeout_for(LLM_TIMEOUT_SECONDS)),
         df=df,
         verbose=True,
         allow_dangerous_code=True,
+        max_execution_time=remaining_time(),
     )
 
     # Retry logic for transient API errors
@@ -261,7 +265,8 @@ def chat_node(df, prompt):
             raise
 
     def to_json(df):
-        return json.loads(df.to_json(orient="records"))
+        # to_json already produces the message text; json.loads + json.dumps re-walked every record
+        return df.to_json(orient="records", date_format="iso")
 
     client = anthropic.Anthropic(api_key=anthropic_api_key)
     system_prompt = (
@@ -275,8 +280,9 @@ def chat_node(df, prompt):
     if type(response) != str:
         response = client.messages.create(
             model="claude-sonnet-4-5",
+            timeout=timeout_for(LLM_TIMEOUT_SECONDS),
             system=system_prompt,
-            messages=[{"role": "assistant", "content": json.dumps(to_json(response))}],
+            messages=[{"role": "assistant", "content": to_json(response)}],
             max_tokens=1024
         )
         return response.content[0].text
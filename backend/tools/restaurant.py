@@ -6,6 +6,8 @@ from dotenv import load_dotenv
 import json
 from langchain_core.runnables import RunnableLambda
 
+from tools.deadline import LLM_TIMEOUT_SECONDS, timeout_for
+
 # ---------- Load keys ----------
 load_dotenv()
 YELP_API_KEY = os.environ.get("YELP_API_KEY")
@@ -41,6 +43,7 @@ def get_yelp_info(original_prompt: str):
 
     response = client.messages.create(
         model="claude-sonnet-4-5",
+        timeout=timeout_for(LLM_TIMEOUT_SECONDS),
         max_tokens=1024,
         tools=[{
             "name": "get_business_info",
@@ -87,7 +90,7 @@ def restaurant_tool(user_prompt: str):
 
     url = "https://api.yelp.com/v3/businesses/search"
     headers = {"Authorization": f"Bearer {YELP_API_KEY}"}
-    resp = requests.get(url, headers=headers, params=params)
+    resp = requests.get(url, headers=headers, params=params, timeout=timeout_for(30))
     yelp_json = resp.json()
 
     if not yelp_json.get("businesses"):
@@ -104,6 +107,7 @@ def restaurant_tool(user_prompt: str):
 
     llm_resp = client.messages.create(
         model="claude-sonnet-4-5",
+        timeout=timeout_for(LLM_TIMEOUT_SECONDS),
         max_tokens=900,
         messages=[{"role": "user", "content": llm_prompt}],
     )